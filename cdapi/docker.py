@@ -6,6 +6,7 @@ variables.
 import os
 from datetime import timedelta
 
+from django.core.exceptions import ImproperlyConfigured
 from dotenv import load_dotenv
 
 from cdapi.settings import *  # pylint: disable=unused-wildcard-import,wildcard-import
@@ -34,7 +35,21 @@ TOKEN_TTL = int(os.getenv('TOKEN_TTL', '5'))
 
 REFRESH_TOKEN_TTL = int(os.getenv('REFRESH_TOKEN_TTL', '40320'))  # 28 days
 
-SIMPLE_JWT['ALGORITHM'] = os.getenv('JWT_ALGORITHM', 'HS256')
+JWT_ALGORITHM = os.getenv('JWT_ALGORITHM', 'HS256')
+
+# The PEM file with the private key the tokens are signed with. If it's set, JWT_ALGORITHM must be
+# an asymmetric algorithm (RS256, ES256 or EdDSA, for example) taking keys of its type, and the
+# public keys are published by the JWKS endpoint (see users.token_backend). Otherwise, the tokens
+# are signed with SECRET_KEY.
+JWT_SIGNING_KEY_FILE = os.getenv('JWT_SIGNING_KEY_FILE', '')
+
+# The comma-separated PEM files with the public keys of the previous key pairs. The tokens signed
+# with them are still accepted, so the key pairs can be rotated without signing the users out.
+JWT_VERIFYING_KEY_FILES = [path for path in os.getenv('JWT_VERIFYING_KEY_FILES', '').split(',')
+                           if path]
+
+if not JWT_SIGNING_KEY_FILE:
+    SIMPLE_JWT['ALGORITHM'] = JWT_ALGORITHM
 
 SIMPLE_JWT['SIGNING_KEY'] = SECRET_KEY
 
@@ -42,6 +57,66 @@ SIMPLE_JWT['SLIDING_TOKEN_LIFETIME'] = timedelta(minutes=TOKEN_TTL)
 
 SIMPLE_JWT['SLIDING_TOKEN_REFRESH_LIFETIME'] = timedelta(minutes=REFRESH_TOKEN_TTL)
 
+# Whether the tokens carry the identity of the user (the username, email and whether the email
+# is confirmed), so that the identity-only endpoints don't touch the database. The identity in
+# an access token may be outdated by up to the lifetime of the access tokens, since it's
+# refreshed along with them.
+JWT_IDENTITY_CLAIMS = os.getenv('JWT_IDENTITY_CLAIMS', 'true').lower() == 'true'
+
+# The number of users (along with their persons) cached by every process to authenticate the
+# requests without querying the database. 0 disables the cache.
+AUTH_USER_CACHE_SIZE = int(os.getenv('AUTH_USER_CACHE_SIZE', '1024'))
+
+# How long (in seconds) the users are cached. Without the shared cache (see below) it's also how
+# long it takes for the changes of a user to be seen by the other processes.
+AUTH_USER_CACHE_TTL = int(os.getenv('AUTH_USER_CACHE_TTL', '60'))
+
+# The alias of the cache (from CACHES) shared by all the processes, which is used to cache the
+# users and to propagate the changes of them right away. Empty means no shared cache.
+AUTH_USER_CACHE_ALIAS = os.getenv('AUTH_USER_CACHE_ALIAS', '')
+
+# The rates of the requests to the authentication endpoints (signing up, obtaining the tokens,
+# confirming the email and resetting the password) from one IP address, on behalf of one
+# username and to one endpoint in total, like 10/min (per second, minute, hour or day). A
+# burst of up to the number of the requests is allowed. Empty disables the limit.
+AUTH_THROTTLE_IP_RATE = os.getenv('AUTH_THROTTLE_IP_RATE', '30/min')
+
+AUTH_THROTTLE_USERNAME_RATE = os.getenv('AUTH_THROTTLE_USERNAME_RATE', '10/min')
+
+AUTH_THROTTLE_ENDPOINT_RATE = os.getenv('AUTH_THROTTLE_ENDPOINT_RATE', '600/min')
+
+# The number of the token buckets kept by every process.
+AUTH_THROTTLE_MAX_BUCKETS = int(os.getenv('AUTH_THROTTLE_MAX_BUCKETS', '10000'))
+
+# The alias of the cache (from CACHES) the token buckets are kept in, so that the rates apply
+# to all the processes together. Empty means every process has its own buckets.
+AUTH_THROTTLE_CACHE_ALIAS = os.getenv('AUTH_THROTTLE_CACHE_ALIAS', '')
+
+# The number of the proxies in front of the API. The IP addresses the requests are throttled by
+# are taken from X-Forwarded-For as it's set by the outermost proxy. 0 means the clients
+# connect directly, so REMOTE_ADDR is used and X-Forwarded-For (which any client can spoof to
+# get a fresh bucket) is ignored.
+REST_FRAMEWORK['NUM_PROXIES'] = int(os.getenv('NUM_PROXIES', '0'))
+
+# How often (in seconds) every process reads the tokens revoked by the other processes. It's
+# how long it takes for a revoked token to be rejected by all the processes.
+TOKEN_REVOCATION_REFRESH_INTERVAL = float(os.getenv('TOKEN_REVOCATION_REFRESH_INTERVAL', '5'))
+
+# How often (in seconds) every process rebuilds its view of the revoked tokens to forget the
+# expired ones.
+TOKEN_REVOCATION_REBUILD_INTERVAL = int(os.getenv('TOKEN_REVOCATION_REBUILD_INTERVAL', '3600'))
+
+# The number of revoked tokens the Bloom filter of every process is sized for and the rate of
+# the false positives (which cost a query) it gives at that size. The filter takes about
+# 1.44 * log2(1 / rate) bits per token, i.e. ~176 KiB by default.
+TOKEN_REVOCATION_BLOOM_CAPACITY = int(os.getenv('TOKEN_REVOCATION_BLOOM_CAPACITY', '100000'))
+
+TOKEN_REVOCATION_BLOOM_ERROR_RATE = float(os.getenv('TOKEN_REVOCATION_BLOOM_ERROR_RATE', '0.001'))
+
+# The number of the revocations of the expired tokens deleted at once by the
+# purge_revoked_tokens management command.
+TOKEN_REVOCATION_PURGE_BATCH_SIZE = int(os.getenv('TOKEN_REVOCATION_PURGE_BATCH_SIZE', '1000'))
+
 SOCIAL_AUTH_GITHUB_KEY = os.getenv('SOCIAL_AUTH_GITHUB_KEY', '')
 
 SOCIAL_AUTH_GITHUB_SECRET = os.getenv('SOCIAL_AUTH_GITHUB_SECRET', '')
@@ -52,8 +127,18 @@ SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET = os.getenv('SOCIAL_AUTH_GOOGLE_OAUTH2_SECRET',
 
 SOCIAL_AUTH_LOGIN_REDIRECT_URL = os.getenv('SOCIAL_AUTH_LOGIN_REDIRECT_URL', '/')
 
+# Set to users.email_backend.PooledEmailBackend to keep the connections to the mail server alive
+# and reuse them.
 EMAIL_BACKEND = os.getenv('EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 
+# The maximum number of idle connections to the mail server kept by every process when
+# PooledEmailBackend is used.
+EMAIL_POOL_SIZE = int(os.getenv('EMAIL_POOL_SIZE', '2'))
+
+# How long (in seconds) an idle connection to the mail server may be reused when
+# PooledEmailBackend is used. It should be less than the timeout of the mail server.
+EMAIL_POOL_MAX_IDLE = int(os.getenv('EMAIL_POOL_MAX_IDLE', '60'))
+
 EMAIL_HOST = os.getenv('EMAIL_HOST', 'localhost')
 
 EMAIL_PORT = int(os.getenv('EMAIL_PORT', '25'))
@@ -64,10 +149,99 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER', '')
 
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD', '')
 
+# How long (in seconds) sending an email may be blocked by the mail server.
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', '10'))
+
 BASE_SITE_URL = os.getenv('BASE_SITE_URL', 'cusdeb.com')
 
 DEFAULT_FROM_EMAIL = os.getenv('DEFAULT_FROM_EMAIL', 'info@cusdeb.com')
 
 DEFAULT_SITE_NAME = os.getenv('DEFAULT_SITE_NAME', 'CusDeb')
 
+# The hasher of the new passwords: pbkdf2, argon2 (requires argon2-cffi) or bcrypt (requires
+# bcrypt). The passwords hashed by the other hashers (or with a different cost) are rehashed as
+# the users sign in.
+PASSWORD_HASHER = os.getenv('PASSWORD_HASHER', 'pbkdf2')
+
+_PASSWORD_HASHERS = {
+    'pbkdf2': 'users.hashers.TunablePBKDF2PasswordHasher',
+    'argon2': 'users.hashers.TunableArgon2PasswordHasher',
+    'bcrypt': 'users.hashers.TunableBCryptSHA256PasswordHasher',
+}
+
+if PASSWORD_HASHER not in _PASSWORD_HASHERS:
+    raise ImproperlyConfigured(f'PASSWORD_HASHER must be one of: {", ".join(_PASSWORD_HASHERS)}')
+
+PASSWORD_HASHERS = [_PASSWORD_HASHERS.pop(PASSWORD_HASHER), *_PASSWORD_HASHERS.values(),
+                    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher']
+
+PASSWORD_HASHER_PBKDF2_ITERATIONS = int(os.getenv('PASSWORD_HASHER_PBKDF2_ITERATIONS', '150000'))
+
+PASSWORD_HASHER_ARGON2_TIME_COST = int(os.getenv('PASSWORD_HASHER_ARGON2_TIME_COST', '2'))
+
+PASSWORD_HASHER_ARGON2_MEMORY_COST = int(os.getenv('PASSWORD_HASHER_ARGON2_MEMORY_COST', '512'))
+
+PASSWORD_HASHER_ARGON2_PARALLELISM = int(os.getenv('PASSWORD_HASHER_ARGON2_PARALLELISM', '2'))
+
+PASSWORD_HASHER_BCRYPT_ROUNDS = int(os.getenv('PASSWORD_HASHER_BCRYPT_ROUNDS', '12'))
+
 EMAIL_CONFIRMATION_TOKEN_TTL = int(os.getenv('EMAIL_CONFIRMATION_TTL', '1440'))  # 24 hours
+
+# The number of expired email confirmation tokens deleted at once by the
+# clear_expired_email_confirmation_tokens management command.
+EMAIL_CONFIRMATION_TOKEN_PURGE_BATCH_SIZE = int(
+    os.getenv('EMAIL_CONFIRMATION_TOKEN_PURGE_BATCH_SIZE', '1000')
+)
+
+# The number of queued emails sent over one connection by the send_queued_emails management
+# command before the next batch is claimed.
+EMAIL_QUEUE_BATCH_SIZE = int(os.getenv('EMAIL_QUEUE_BATCH_SIZE', '50'))
+
+# How long (in seconds) the send_queued_emails management command has to send the batch of
+# emails it's claimed before the other workers may claim them again. It must be longer than it
+# takes to send a batch, which is up to EMAIL_QUEUE_BATCH_SIZE * EMAIL_TIMEOUT.
+EMAIL_QUEUE_LEASE = int(os.getenv('EMAIL_QUEUE_LEASE', '900'))
+
+# How many times a queued email is attempted to be sent before giving up on it.
+EMAIL_QUEUE_MAX_ATTEMPTS = int(os.getenv('EMAIL_QUEUE_MAX_ATTEMPTS', '8'))
+
+# How long (in seconds) the first retry of a queued email is delayed. The delay is doubled
+# with every failed attempt.
+EMAIL_QUEUE_RETRY_DELAY = int(os.getenv('EMAIL_QUEUE_RETRY_DELAY', '60'))
+
+# How often (in seconds) the send_queued_emails management command checks for new emails when
+# the queue is empty.
+EMAIL_QUEUE_POLL_INTERVAL = float(os.getenv('EMAIL_QUEUE_POLL_INTERVAL', '5'))
+
+# The priorities of the images of the users depending on their plan (the 'plan' key of the props
+# of their persons), like paid:high,trial:normal. The images of the users without a plan (or
+# with an unlisted one) have normal priority, the anonymous images have low priority.
+IMAGES_PLAN_PRIORITIES = dict(item.split(':', 1) for item in
+                              os.getenv('IMAGES_PLAN_PRIORITIES', 'paid:high').split(',') if item)
+
+if not set(IMAGES_PLAN_PRIORITIES.values()) <= {'high', 'normal', 'low'}:
+    raise ImproperlyConfigured('IMAGES_PLAN_PRIORITIES may only contain the high, normal and '
+                               'low priorities')
+
+# How often (in seconds) the clients tailing the build log of an image being built are told to
+# poll for new output.
+BUILD_LOG_POLL_INTERVAL = int(os.getenv('BUILD_LOG_POLL_INTERVAL', '2'))
+
+# The number of images per page of the images list unless the client asks for another one (up
+# to IMAGES_MAX_PAGE_SIZE).
+IMAGES_PAGE_SIZE = int(os.getenv('IMAGES_PAGE_SIZE', '20'))
+
+IMAGES_MAX_PAGE_SIZE = int(os.getenv('IMAGES_MAX_PAGE_SIZE', '100'))
+
+# The maximum number of images which can be changed by one batch request.
+IMAGES_BATCH_MAX_SIZE = int(os.getenv('IMAGES_BATCH_MAX_SIZE', '500'))
+
+# The file which is touched to make all the processes serving the API reload the devices
+# catalogue (see the reload_devices management command). It must be shared by all of them, so
+# it's kept in the project directory rather than in the temporary one, which may be private to
+# every process (systemd's PrivateTmp, for example).
+DEVICES_RELOAD_STAMP = os.getenv('DEVICES_RELOAD_STAMP', os.path.join(BASE_DIR, 'devices.reload'))
+
+# How often (in seconds) the processes serving the API check if they have to reload the devices
+# catalogue.
+DEVICES_RELOAD_CHECK_INTERVAL = int(os.getenv('DEVICES_RELOAD_CHECK_INTERVAL', '10'))
@@ -1,9 +1,6 @@
 """Django config module. """
 
 from django.apps import AppConfig
-from django.conf import settings
-
-from pieman_devices import get_devices
 
 
 class ImagesConfig(AppConfig):
@@ -12,4 +9,7 @@ class ImagesConfig(AppConfig):
     name = 'images'
 
     def ready(self):
-        settings.DEVICES_LIST = get_devices()
+        import images.signals  # pylint: disable=unused-import,import-outside-toplevel
+        from images.devices import load_catalogue  # pylint: disable=import-outside-toplevel
+
+        load_catalogue()
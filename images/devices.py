@@ -0,0 +1,129 @@
+"""Module containing the catalogue of the devices supported by CusDeb. """
+
+import gzip
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.http import quote_etag
+from pieman_devices import get_devices
+
+_CURRENT = {
+    'catalogue': None,
+    'stamp': None,
+    'checked_at': 0.0,
+}
+
+
+class DeviceCatalogue:
+    """The devices (and the operating systems for them) supported by CusDeb along with their
+    representation ready to be served: the JSON and gzipped JSON bytes and their ETags (the
+    representations differ, so they must not share a strong ETag).
+
+    The catalogue is also indexed by the architecture, vendor, distro and flavour to answer
+    the queries (see query) without scanning it. Every index maps a lowercased value to the set
+    of the (device id, distro id) pairs it applies to.
+    """
+
+    def __init__(self, devices):
+        self.devices = devices
+        self.json = json.dumps(devices).encode()
+        self.gzipped_json = gzip.compress(self.json)
+        self.etag = quote_etag(hashlib.sha1(self.json).hexdigest())
+        self.gzipped_etag = quote_etag(hashlib.sha1(self.json).hexdigest() + '-gz')
+
+        self._indexes = {
+            'arch': defaultdict(set),
+            'vendor': defaultdict(set),
+            'distro': defaultdict(set),
+            'flavour': defaultdict(set),
+        }
+        for device_id, device in devices.items():
+            for distro_id, distro in device['distros'].items():
+                pair = (device_id, distro_id)
+                self._indexes['arch'][distro['port'].lower()].add(pair)
+                self._indexes['vendor'][device['name'].lower()].add(pair)
+                # A distro can be specified either by its id or by its name.
+                self._indexes['distro'][distro_id.lower()].add(pair)
+                self._indexes['distro'][distro['name'].lower()].add(pair)
+                for flavour in distro['build_types']:
+                    self._indexes['flavour'][flavour.lower()].add(pair)
+
+    def query(self, **criteria):
+        """Returns the devices matching all the specified criteria (arch, vendor, distro and
+        flavour; the ones which are None are ignored). Only the matching distros are left in
+        the devices.
+        """
+
+        pairs = None
+        for name, value in criteria.items():
+            if value is None:
+                continue
+
+            matching_pairs = self._indexes[name].get(value.lower(), set())
+            pairs = matching_pairs if pairs is None else pairs & matching_pairs
+
+        if pairs is None:
+            return self.devices
+
+        distros = defaultdict(list)
+        for device_id, distro_id in pairs:
+            distros[device_id].append(distro_id)
+
+        return {
+            device_id: {
+                **device,
+                'distros': {distro_id: distro for distro_id, distro in device['distros'].items()
+                            if distro_id in distros[device_id]},
+            }
+            for device_id, device in self.devices.items() if device_id in distros
+        }
+
+
+def _get_reload_stamp():
+    """Returns the modification time of the file which is touched to request reloading the
+    catalogue or None if there is no such file.
+    """
+
+    try:
+        return os.stat(settings.DEVICES_RELOAD_STAMP).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def load_catalogue():
+    """Loads the catalogue from pieman-devices and makes it the current one. """
+
+    stamp = _get_reload_stamp()
+    catalogue = DeviceCatalogue(get_devices())
+
+    _CURRENT['catalogue'] = catalogue
+    _CURRENT['stamp'] = stamp
+    _CURRENT['checked_at'] = time.monotonic()
+    settings.DEVICES_LIST = catalogue.devices
+
+    return catalogue
+
+
+def request_reload():
+    """Makes all the processes serving the API reload the catalogue (within
+    DEVICES_RELOAD_CHECK_INTERVAL seconds).
+    """
+
+    with open(settings.DEVICES_RELOAD_STAMP, 'ab'):
+        os.utime(settings.DEVICES_RELOAD_STAMP)
+
+
+def get_catalogue():
+    """Returns the current catalogue, reloading it first if it was requested. """
+
+    current_time = time.monotonic()
+    if current_time - _CURRENT['checked_at'] >= settings.DEVICES_RELOAD_CHECK_INTERVAL:
+        _CURRENT['checked_at'] = current_time
+        if _get_reload_stamp() != _CURRENT['stamp']:
+            return load_catalogue()
+
+    return _CURRENT['catalogue']
@@ -4,9 +4,11 @@ step only).
 
 from django.urls import re_path
 
-from .views import ListDevicesView
+from .views import DevicesView, ListDevicesView
 
 
 urlpatterns = [  # pylint: disable=invalid-name
     re_path('list_devices/?$', ListDevicesView.as_view(), name='list-devices'),
+    re_path('^devices/?$', DevicesView.as_view(), name='devices'),
+    re_path('^devices/(?P<device_id>[^/]+)/?$', DevicesView.as_view(), name='device'),
 ]
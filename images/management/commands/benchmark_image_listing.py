@@ -0,0 +1,64 @@
+"""Management command measuring how fast the images list is served. """
+
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from images.models import Image
+from images.views import ListImagesView
+
+
+class Rollback(Exception):
+    """Raised to roll back the benchmark data. """
+
+
+class Command(BaseCommand):
+    """Creates a user with a lot of images (in a transaction which is rolled back at the end) and
+    measures how many images per second ListImagesView fetches, serializes and renders.
+    """
+
+    help = 'Measures the throughput of listing the images of a user.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10_000,
+                            help='Number of images the user has.')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Number of times the list is requested.')
+        parser.add_argument('--query', default='',
+                            help='Query string of the requests, e.g. fields=image_id,status.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options['rows'], options['repeat'], options['query'])
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _run(self, rows, repeat, query):
+        user = User.objects.create(username='benchmark.user')
+        Image.objects.bulk_create(
+            Image(user=user, image_id=f'00000000-0000-0000-0000-{i:012}', device_name='rpi-3-b',
+                  distro_name='ubuntu-focal-armhf', status=Image.SUCCEEDED,
+                  notes='Some notes', props={'packages': ['curl', 'vim']})
+            for i in range(rows)
+        )
+
+        view = ListImagesView.as_view()
+        request_factory = APIRequestFactory()
+        timings = []
+        for _ in range(repeat):
+            request = request_factory.get(f'/api/v1/images/all/?{query}')
+            force_authenticate(request, user=user)
+
+            start = time.perf_counter()
+            response = view(request, version='v1')
+            response.render()
+            timings.append(time.perf_counter() - start)
+
+        best = min(timings)
+        self.stdout.write(f'{rows} images: best {best * 1000:.1f} ms, '
+                          f'{rows / best:,.0f} images/s')
@@ -0,0 +1,114 @@
+"""Management command printing the query plans of the hot queries against the Image table. """
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from images.models import Image
+
+
+class Rollback(Exception):
+    """Raised to roll back the benchmark data. """
+
+
+class Command(BaseCommand):
+    """Fills the Image table with fake images (in a transaction which is rolled back at the end)
+    and prints the plans of the queries the API and the builders run, with and without the
+    indexes of the Image table.
+    """
+
+    help = 'Prints the query plans of the hot queries against the Image table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000,
+                            help='Number of fake images to create.')
+        parser.add_argument('--users', type=int, default=1000,
+                            help='Number of fake users owning the images.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                user_id = self._populate(options['rows'], options['users'])
+
+                try:
+                    with transaction.atomic():
+                        self._drop_indexes()
+                        self.stdout.write(self.style.MIGRATE_HEADING('Without the indexes'))
+                        self._explain(user_id)
+
+                        raise Rollback
+                except Rollback:
+                    pass
+
+                self.stdout.write(self.style.MIGRATE_HEADING('With the indexes'))
+                self._explain(user_id)
+
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _populate(self, rows, users):
+        """Creates the fake users and images and returns the id of one of the users. """
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO auth_user (password, is_superuser, username, first_name, last_name, "
+                "                       email, is_staff, is_active, date_joined) "
+                "SELECT '!', false, 'benchmark.user.' || n, '', '', '', false, true, now() "
+                "FROM generate_series(1, %s) AS n RETURNING id",
+                [users],
+            )
+            user_ids = [row[0] for row in cursor.fetchall()]
+
+            # Most of the images are built, a small fraction of them are either pending or
+            # were never started (undefined).
+            cursor.execute(
+                "INSERT INTO images_image (user_id, image_id, device_name, distro_name, flavour, "
+                "                          created_at, status, priority, turn, queued_at, notes, "
+                "                          build_log_size, build_log_checksum, props) "
+                "SELECT (%s::integer[])[1 + n %% %s], "
+                "       md5(n::text)::uuid::text, 'rpi-3-b', 'ubuntu-focal-armhf', 'C', "
+                "       now() - n * interval '1 second', "
+                "       CASE WHEN n %% 100 = 0 THEN 'P' WHEN n %% 10 = 0 THEN 'U' ELSE 'S' END, "
+                "       1, n / %s, now() - n * interval '1 second', '', 0, 0, '{}' "
+                "FROM generate_series(1, %s) AS n",
+                [user_ids, len(user_ids), len(user_ids), rows],
+            )
+            # Check the deferred foreign keys right away, otherwise the table can't be altered.
+            cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+            cursor.execute('ANALYZE auth_user')
+            cursor.execute(f'ANALYZE {Image._meta.db_table}')
+
+        return user_ids[0]
+
+    def _drop_indexes(self):  # pylint: disable=no-self-use
+        """Drops all the indexes of the Image table except the primary key and the index of the
+        foreign key.
+        """
+
+        table = Image._meta.db_table
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(cursor, table)
+            for name, info in constraints.items():
+                if info['primary_key'] or info['foreign_key'] or info['check']:
+                    continue
+                if info['columns'] == ['user_id']:
+                    continue
+
+                if info['index']:
+                    cursor.execute(f'DROP INDEX "{name}"')
+                else:
+                    cursor.execute(f'ALTER TABLE "{table}" DROP CONSTRAINT "{name}"')
+
+    def _explain(self, user_id):
+        image_id = Image.objects.filter(user_id=user_id).values_list('image_id', flat=True)[0]
+        queries = (
+            ('Listing the images of a user (a page)',
+             Image.objects.without_undefined().filter(user_id=user_id)
+             .order_by('-created_at', '-id')[:20]),
+            ('Looking up an image by image_id', Image.objects.filter(image_id=image_id)),
+            ('Picking the next images to build', Image.objects.queue()[:10]),
+        )
+        for title, queryset in queries:
+            self.stdout.write(self.style.SQL_KEYWORD(title))
+            self.stdout.write(queryset.explain())
+            self.stdout.write('')
@@ -0,0 +1,20 @@
+"""Management command reloading the devices catalogue without restarting the API. """
+
+from django.core.management.base import BaseCommand
+
+from images.devices import load_catalogue, request_reload
+
+
+class Command(BaseCommand):
+    """Makes sure the current pieman-devices can be loaded and asks all the processes serving
+    the API to reload the devices catalogue.
+    """
+
+    help = 'Reloads the devices catalogue in all the processes serving the API.'
+
+    def handle(self, *args, **options):
+        catalogue = load_catalogue()
+        request_reload()
+
+        self.stdout.write(f'Requested reloading the catalogue of {len(catalogue.devices)} '
+                          f'devices.')
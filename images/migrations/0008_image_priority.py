@@ -0,0 +1,22 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0007_auto_20210307_1330'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'High'), (1, 'Normal'), (2, 'Low')], default=1),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['status', 'priority', 'user', 'created_at', 'id'], name='image_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0008_image_priority'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='image',
+            name='image_queue_idx',
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='image_id',
+            field=models.CharField(max_length=36, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['user', 'status', 'created_at'], name='image_user_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(condition=models.Q(status='P'), fields=['priority', 'user', 'created_at', 'id'], name='image_queue_idx'),
+        ),
+    ]
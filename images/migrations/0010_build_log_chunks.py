@@ -0,0 +1,65 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:46
+
+import zlib
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def move_build_logs_to_chunks(apps, _schema_editor):
+    Image = apps.get_model('images', 'Image')
+    BuildLogChunk = apps.get_model('images', 'BuildLogChunk')
+
+    images = Image.objects.exclude(build_log='').only('build_log')
+    for image in images.iterator():
+        data = image.build_log.encode()
+        BuildLogChunk.objects.create(image=image, offset=0, data=data)
+        Image.objects.filter(pk=image.pk).update(build_log_size=len(data),
+                                                 build_log_checksum=zlib.crc32(data))
+
+
+def move_build_logs_from_chunks(apps, _schema_editor):
+    Image = apps.get_model('images', 'Image')
+    BuildLogChunk = apps.get_model('images', 'BuildLogChunk')
+
+    for image in Image.objects.exclude(build_log_size=0).only('pk').iterator():
+        chunks = BuildLogChunk.objects.filter(image=image).order_by('offset')
+        data = b''.join(bytes(chunk) for chunk in chunks.values_list('data', flat=True))
+        Image.objects.filter(pk=image.pk).update(build_log=data.decode(errors='replace'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0009_image_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='build_log_checksum',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='build_log_size',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='BuildLogChunk',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('offset', models.BigIntegerField()),
+                ('data', models.BinaryField()),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='build_log_chunks', to='images.Image')),
+            ],
+            options={
+                'unique_together': {('image', 'offset')},
+            },
+        ),
+        migrations.RunPython(move_build_logs_to_chunks, move_build_logs_from_chunks),
+        migrations.RemoveField(
+            model_name='image',
+            name='build_log',
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 2.2.28 on 2026-10-18 06:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0010_build_log_chunks'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='image',
+            name='image_user_status_idx',
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(condition=models.Q(_negated=True, status='U'), fields=['user', 'created_at', 'id'], name='image_user_list_idx'),
+        ),
+    ]
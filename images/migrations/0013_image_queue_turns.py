@@ -0,0 +1,46 @@
+# Generated by Django 2.2.28 on 2026-10-18 07:42
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0012_image_list_version'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='image',
+            name='image_queue_idx',
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='queued_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='turn',
+            field=models.BigIntegerField(default=0),
+        ),
+        # The pending images are queued in the order they were created.
+        migrations.RunSQL(
+            "UPDATE images_image SET queued_at = created_at WHERE status = 'P'",
+            migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name='image',
+            name='priority',
+            field=models.PositiveSmallIntegerField(blank=True, choices=[(0, 'High'), (1, 'Normal'), (2, 'Low')]),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(condition=models.Q(status='P'), fields=['priority', 'turn', 'queued_at', 'id'], name='image_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(condition=models.Q(status='P'), fields=['user', 'priority', 'turn'], name='image_user_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.28 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('images', '0013_image_queue_turns'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='image',
+            name='priority',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'High'), (1, 'Normal'), (2, 'Low')], default=1),
+        ),
+        # Django doesn't keep the defaults in the database, but the builder services insert
+        # images bypassing it.
+        migrations.RunSQL(
+            'ALTER TABLE images_image ALTER COLUMN priority SET DEFAULT 1',
+            'ALTER TABLE images_image ALTER COLUMN priority DROP DEFAULT',
+        ),
+    ]
@@ -1,10 +1,16 @@
 """Data models for the CusDeb API Images application. """
 
+import zlib
+
 from django.contrib.auth.models import User
 from django.contrib.postgres.fields import JSONField
-from django.db import models, transaction
+from django.conf import settings
+from django.db import connection, models, transaction
+from django.db.models import F, Max, Min, Q
 from django.utils.timezone import now
 
+from users.models import Person
+
 
 class ImageManager(models.Manager):
     """Image model manager. """
@@ -15,24 +21,168 @@ class ImageManager(models.Manager):
         return self.exclude(status=Image.UNDEFINED)
 
     def get_any(self):
+        """Claims a pending for building image (see get_many). Returns the image or None if
+        there is nothing to build.
+        """
+
+        images = self.get_many(1)
+        return images[0] if images else None
+
+    def delete_owned(self, user_id, image_ids):
+        """Deletes the specified images (along with their build logs) which belong to the
+        specified user. Both the ownership check and the deletion are done by one query.
+        Returns the set of the ids of the deleted images.
+        """
+
+        image_table = self.model._meta.db_table
+        chunk_table = BuildLogChunk._meta.db_table
+        return self._mutate_owned(
+            user_id,
+            f'WITH image AS ('
+            f'    DELETE FROM {image_table} WHERE image_id = ANY(%s) AND user_id = %s '
+            f'    RETURNING id, image_id'
+            f'), chunks AS ('
+            f'    DELETE FROM {chunk_table} WHERE image_id IN (SELECT id FROM image)'
+            f') '
+            f'SELECT image_id FROM image',
+            [list(image_ids), user_id],
+        )
+
+    def update_notes_owned(self, user_id, image_ids, notes):
+        """Updates the notes of the specified images which belong to the specified user. Both
+        the ownership check and the update are done by one query. Returns the set of the ids of
+        the updated images.
+        """
+
+        image_table = self.model._meta.db_table
+        return self._mutate_owned(
+            user_id,
+            f'UPDATE {image_table} SET notes = %s WHERE image_id = ANY(%s) AND user_id = %s '
+            f'RETURNING image_id',
+            [notes, list(image_ids), user_id],
+        )
+
+    def requeue_owned(self, user_id, image_ids):
+        """Puts the specified images which belong to the specified user and failed (or were
+        interrupted) back into the build queue, dropping their build logs. Both the checks and
+        the update are done by one query. Returns the set of the ids of the requeued images.
         """
-        * Fetches a pending for building image from the database.
-        * Changes the image status to 'BUILDING'.
-        * Returns the image.
+
+        image_table = self.model._meta.db_table
+        chunk_table = BuildLogChunk._meta.db_table
+        # The images are put at the end of the queue the same way the new ones are (see
+        # get_turn), in the order they were created.
+        return self._mutate_owned(
+            user_id,
+            f'WITH target AS ('
+            f'    SELECT id, row_number() OVER (PARTITION BY priority '
+            f'                                  ORDER BY created_at, id) - 1 AS position '
+            f'    FROM {image_table} '
+            f'    WHERE image_id = ANY(%s) AND user_id = %s AND status IN (%s, %s)'
+            f'), image AS ('
+            f'    UPDATE {image_table} AS requeued '
+            f'    SET status = %s, started_at = NULL, finished_at = NULL, '
+            f'        build_log_size = 0, build_log_checksum = 0, queued_at = %s, '
+            f'        turn = target.position + COALESCE(GREATEST('
+            f'            (SELECT min(turn) FROM {image_table} '
+            f'             WHERE status = %s AND priority = requeued.priority), '
+            f'            (SELECT max(turn) + 1 FROM {image_table} '
+            f'             WHERE status = %s AND priority = requeued.priority AND user_id = %s)'
+            f'        ), 0) '
+            f'    FROM target WHERE requeued.id = target.id '
+            f'    RETURNING requeued.id, requeued.image_id'
+            f'), chunks AS ('
+            f'    DELETE FROM {chunk_table} WHERE image_id IN (SELECT id FROM image)'
+            f') '
+            f'SELECT image_id FROM image',
+            [list(image_ids), user_id, Image.FAILED, Image.INTERRUPTED, Image.PENDING, now(),
+             Image.PENDING, Image.PENDING, user_id],
+        )
+
+    @staticmethod
+    def _mutate_owned(user_id, sql, params):
+        """Runs the query changing the images of the specified user, which returns the ids of
+        the changed images, and bumps the version of the images list of the user if any of them
+        were changed.
         """
 
         with transaction.atomic():
-            image = self.select_for_update().filter(status=Image.PENDING).first()
-            if not image:
-                return None
+            with connection.cursor() as cursor:
+                cursor.execute(sql, params)
+                image_ids = {row[0] for row in cursor.fetchall()}
+
+            if image_ids:
+                ImageListVersion.objects.bump([user_id])
+
+        return image_ids
 
-            image.status = Image.BUILDING
-            image.save(update_fields=['status'])
+    @staticmethod
+    def get_plan_priority(user_id):
+        """Returns the priority of the images of the specified user, which depends on their plan
+        (see IMAGES_PLAN_PRIORITIES). The anonymous images have low priority.
+        """
+
+        if user_id is None:
+            return Image.LOW_PRIORITY
+
+        plan = Person.objects.filter(user_id=user_id).values_list('props__plan', flat=True).first()
+        priority = settings.IMAGES_PLAN_PRIORITIES.get(plan, 'normal')
 
-        return image
+        return Image.PRIORITY_NAMES[priority]
+
+    def get_turn(self, user_id, priority):
+        """Returns the turn a new pending image of the specified user and priority takes: the
+        turn right after the last pending image of the user, but not earlier than the turn
+        being built, so the users take turns (see queue). Both bounds are found by one query
+        using the indexes.
+        """
 
+        user_filter = Q(user__isnull=True) if user_id is None else Q(user_id=user_id)
+        turns = (self.filter(status=Image.PENDING, priority=priority)
+                 .aggregate(current=Min('turn'), last=Max('turn', filter=user_filter)))
+        if turns['last'] is not None:
+            return max(turns['current'], turns['last'] + 1)
 
-class Image(models.Model):
+        return turns['current'] or 0
+
+    def queue(self):
+        """Returns the pending images in the order they are supposed to be built:
+        * the images with a higher priority go first;
+        * within a priority the users take turns, i.e. the first images of every user go
+          before the second ones and so on, so a user queueing a lot of images at once can't
+          starve the others (all the anonymous images share one turn);
+        * the images of the same turn are built in the order they were queued.
+
+        The turns are assigned when the images are queued (see get_turn), so the order is
+        backed by an index and taking the first images of the queue is O(log n).
+        """
+
+        return self.filter(status=Image.PENDING).order_by('priority', 'turn', 'queued_at', 'pk')
+
+    def get_many(self, count):
+        """
+        * Fetches up to 'count' pending for building images from the database in the queue
+          order (see queue), skipping the rows which are being claimed by the other builders at
+          the same time.
+        * Changes the images status to 'BUILDING'.
+        * Returns the list of the images.
+        """
+
+        with transaction.atomic():
+            images = list(self.queue().select_for_update(skip_locked=True)[:count])
+            if not images:
+                return []
+
+            self.filter(pk__in=[image.pk for image in images]).update(status=Image.BUILDING)
+            for image in images:
+                image.status = Image.BUILDING
+
+            ImageListVersion.objects.bump(image.user_id for image in images)
+
+        return images
+
+
+class Image(models.Model):  # pylint: disable=too-many-instance-attributes
     """Model representing an image which has been built (or is being built) by CusDeb. """
 
     CLASSIC = 'C'
@@ -61,11 +211,51 @@ class Image(models.Model):
         (SUCCEEDED, 'Succeeded'),
     )
 
+    HIGH_PRIORITY = 0
+    NORMAL_PRIORITY = 1
+    LOW_PRIORITY = 2
+
+    PRIORITY_CHOICES = (
+        (HIGH_PRIORITY, 'High'),
+        (NORMAL_PRIORITY, 'Normal'),
+        (LOW_PRIORITY, 'Low'),
+    )
+
+    PRIORITY_NAMES = {name.lower(): priority for priority, name in PRIORITY_CHOICES}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The images loaded from the database are built from positional arguments.
+        self._priority_specified = bool(args) or 'priority' in kwargs
+
+    def save(self, force_insert=False, force_update=False, using=None,
+             update_fields=None):
+        if self._state.adding:
+            if not self._priority_specified:
+                self.priority = Image.objects.get_plan_priority(self.user_id)
+                self._priority_specified = True
+            self._take_turn()
+
+        return super().save(force_insert=force_insert, force_update=force_update, using=using,
+                            update_fields=update_fields)
+
+    def _take_turn(self):
+        """Puts the image at the end of the build queue (see ImageManager.queue). """
+
+        self.turn = Image.objects.get_turn(self.user_id, self.priority)
+        self.queued_at = now()
+
     def change_status_to(self, status):
-        """Changes the current status to the specified one. """
+        """Changes the current status to the specified one. The image becoming pending is put
+        at the end of the build queue.
+        """
 
         self.status = status
-        self.save(update_fields=['status'])
+        if status == Image.PENDING:
+            self._take_turn()
+            self.save(update_fields=['status', 'turn', 'queued_at'])
+        else:
+            self.save(update_fields=['status'])
 
     def set_started_at(self):
         """Sets the 'started_at' field to now. """
@@ -79,14 +269,58 @@ class Image(models.Model):
         self.finished_at = now()
         self.save(update_fields=['finished_at'])
 
+    def append_build_log(self, data):
+        """Appends the specified piece (either str or bytes) to the build log. """
+
+        if isinstance(data, str):
+            data = data.encode()
+        if not data:
+            return
+
+        with transaction.atomic():
+            # Lock the image to serialize the concurrent appends.
+            image = (Image.objects.select_for_update()
+                     .only('build_log_size', 'build_log_checksum')
+                     .get(pk=self.pk))
+            BuildLogChunk.objects.create(image=self, offset=image.build_log_size, data=data)
+
+            self.build_log_size = image.build_log_size + len(data)
+            self.build_log_checksum = zlib.crc32(data, image.build_log_checksum)
+            self.save(update_fields=['build_log_size', 'build_log_checksum'])
+
     def store_build_log(self, build_log):
-        """Stores the build log in the 'build_log' field. """
+        """Replaces the build log with the specified one. """
 
-        self.build_log = build_log
-        self.save(update_fields=['build_log'])
+        with transaction.atomic():
+            self.build_log_chunks.all().delete()
+            self.build_log_size = 0
+            self.build_log_checksum = 0
+            self.save(update_fields=['build_log_size', 'build_log_checksum'])
+
+            self.append_build_log(build_log)
+
+    def read_build_log(self, start=0, end=None):
+        """Yields the pieces (bytes) of the build log between the specified offsets. The end
+        offset is exclusive.
+        """
+
+        chunks = self.build_log_chunks.order_by('offset')
+        if start:
+            first_offset = (self.build_log_chunks.filter(offset__lte=start)
+                            .order_by('-offset')
+                            .values_list('offset', flat=True)
+                            .first())
+            chunks = chunks.filter(offset__gte=first_offset or 0)
+        if end is not None:
+            chunks = chunks.filter(offset__lt=end)
+
+        for offset, data in chunks.values_list('offset', 'data').iterator():
+            piece = bytes(data)[max(start - offset, 0):None if end is None else end - offset]
+            if piece:
+                yield piece
 
     user = models.ForeignKey(User, models.CASCADE, null=True, blank=True)
-    image_id = models.CharField(max_length=36)
+    image_id = models.CharField(max_length=36, unique=True)
     device_name = models.CharField(max_length=64)
     distro_name = models.CharField(max_length=64)
     flavour = models.CharField(max_length=1, choices=FLAVOUR_CHOICES, default=CLASSIC)
@@ -94,10 +328,97 @@ class Image(models.Model):
     started_at = models.DateTimeField(blank=True, null=True)
     finished_at = models.DateTimeField(blank=True, null=True)
     status = models.CharField(max_length=1, choices=STATUS_CHOICES, default=UNDEFINED)
+    # Unless it's specified, Image.save() takes the priority from the plan of the user (see
+    # ImageManager.get_plan_priority). The images inserted bypassing it (bulk_create, the
+    # builder services) are of normal priority, the column has the same default in the database.
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES,
+                                                default=NORMAL_PRIORITY)
+    turn = models.BigIntegerField(default=0)
+    queued_at = models.DateTimeField(default=now)
     notes = models.TextField(default='')
-    build_log = models.TextField(default='')
+    build_log_size = models.BigIntegerField(default=0)
+    build_log_checksum = models.BigIntegerField(default=0)  # CRC-32
     props = JSONField(default=dict)
     objects = ImageManager()
 
+    class Meta:
+        indexes = [
+            # Backs listing the images of a user page by page (see ImageCursorPagination).
+            models.Index(fields=['user', 'created_at', 'id'], name='image_user_list_idx',
+                         condition=~models.Q(status='U')),
+            # Back ImageManager.queue and ImageManager.get_turn respectively. Only the pending
+            # images are indexed since they are a tiny fraction of the table.
+            models.Index(fields=['priority', 'turn', 'queued_at', 'id'], name='image_queue_idx',
+                         condition=models.Q(status='P')),
+            models.Index(fields=['user', 'priority', 'turn'], name='image_user_queue_idx',
+                         condition=models.Q(status='P')),
+        ]
+
     def __str__(self):
         return f'{self.distro_name} on {self.device_name}'
+
+
+class BuildLogChunk(models.Model):
+    """Model representing a piece of the build log of an image. The builders append the pieces
+    while the image is being built, so the log is never rewritten as a whole.
+    """
+
+    image = models.ForeignKey(Image, models.CASCADE, related_name='build_log_chunks')
+    offset = models.BigIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        unique_together = ('image', 'offset')
+
+    def __str__(self):
+        return f'{self.image} [{self.offset}:{self.offset + len(self.data)}]'
+
+
+class ImageListVersionManager(models.Manager):
+    """ImageListVersion model manager. """
+
+    def bump(self, user_ids, create_missing=True):
+        """Bumps the versions of the images lists of the specified users. The missing versions
+        are created unless create_missing is False (which is required when the users themselves
+        might be being deleted).
+        """
+
+        user_ids = {user_id for user_id in user_ids if user_id is not None}
+        if not user_ids:
+            return
+
+        if not create_missing:
+            self.filter(user_id__in=user_ids).update(version=F('version') + 1, changed_at=now())
+            return
+
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (user_id, version, changed_at) '
+                f'SELECT user_id, 1, %s FROM unnest(%s) AS user_id '
+                f'ON CONFLICT (user_id) DO UPDATE '
+                f'SET version = {table}.version + 1, changed_at = EXCLUDED.changed_at',
+                [now(), sorted(user_ids)],
+            )
+
+    def get_version(self, user_id):
+        """Returns both the version of the images list of the specified user and the time it
+        was changed last (None if it has never changed).
+        """
+
+        version = self.filter(user_id=user_id).values_list('version', 'changed_at').first()
+        return version or (0, None)
+
+
+class ImageListVersion(models.Model):
+    """Model representing the version of the images list of a user. The version is bumped every
+    time the images of the user change, so it's a cheap validator for conditional requests.
+    """
+
+    user = models.OneToOneField(User, models.CASCADE, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    changed_at = models.DateTimeField(default=now)
+    objects = ImageListVersionManager()
+
+    def __str__(self):
+        return f'{self.user} v{self.version}'
@@ -0,0 +1,93 @@
+"""Module containing the pagination classes for the CusDeb API Images application. """
+
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+
+
+class ImageCursorPagination(CursorPagination):  # pylint: disable=too-many-instance-attributes
+    """Paginates the images of a user from the newest to the oldest ones. The cursor holds the
+    (created_at, id) key of the image the page starts after, so the pages stay stable while new
+    images are being added, and every page is a range scan of the image_user_list_idx index
+    however deep it is (the key is unique, so the cursor never needs an offset).
+
+    The page size is IMAGES_PAGE_SIZE unless the client passes the page_size query parameter
+    (up to IMAGES_MAX_PAGE_SIZE).
+    """
+
+    ordering = ('-created_at', '-id')
+    page_size_query_param = 'page_size'
+
+    # The state of the page is kept in the attributes just like CursorPagination does.
+    # pylint: disable=attribute-defined-outside-init
+    def get_page_size(self, request):
+        # The settings are read on every request rather than when the module is imported.
+        self.page_size = settings.IMAGES_PAGE_SIZE
+        self.max_page_size = settings.IMAGES_MAX_PAGE_SIZE
+        return super().get_page_size(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.cursor = self.decode_cursor(request)
+        reverse = self.cursor is not None and self.cursor.reverse
+        position = self.cursor.position if self.cursor is not None else None
+
+        if reverse:
+            queryset = queryset.order_by('created_at', 'id')
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if position is not None:
+            table = queryset.model._meta.db_table  # pylint: disable=protected-access
+            operator = '>' if reverse else '<'
+            queryset = queryset.extra(
+                where=[f'({table}.created_at, {table}.id) {operator} (%s, %s)'],
+                params=list(self._parse_position(position)),
+            )
+
+        # Fetch an extra image to find out whether there is a page following this one.
+        results = list(queryset[:self.page_size + 1])
+        self.page = results[:self.page_size]
+        following_position = (self._get_position_from_instance(results[-1], self.ordering)
+                              if len(results) > len(self.page) else None)
+
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.next_position = position is not None, position
+            self.has_previous = following_position is not None
+            self.previous_position = following_position
+        else:
+            self.has_next = following_position is not None
+            self.next_position = following_position
+            self.has_previous, self.previous_position = position is not None, position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        if isinstance(instance, dict):
+            created_at, pk = instance['created_at'], instance['id']
+        else:
+            created_at, pk = instance.created_at, instance.id
+
+        return f'{created_at.isoformat()}|{pk}'
+
+    def _parse_position(self, position):
+        created_at, _, pk = position.partition('|')
+        try:
+            created_at = parse_datetime(created_at)
+            pk = int(pk)
+        except ValueError:
+            created_at = None
+
+        if created_at is None:
+            raise NotFound(self.invalid_cursor_message)
+
+        return created_at, pk
@@ -1,30 +1,45 @@
 """Module containing serializers for the CusDeb API Images application. """
 
+from django.conf import settings
 from rest_framework import serializers
 
 from .models import Image
 
 
+class ChoiceDisplayField(serializers.Field):  # pylint: disable=abstract-method
+    """Serializes the value of a choice field into its human-readable name. """
+
+    def __init__(self, choices, **kwargs):
+        self.display_names = dict(choices)
+        kwargs['read_only'] = True
+
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return self.display_names[value]
+
+
 class ImageSerializer(serializers.ModelSerializer):
-    """Serializes an image. """
+    """Serializes an image. Both model instances and dicts (see QuerySet.values) are accepted.
+    The 'fields' keyword argument limits the serialized fields to the specified ones.
+    """
 
-    flavour = serializers.SerializerMethodField()
-    status = serializers.SerializerMethodField()
+    flavour = ChoiceDisplayField(Image.FLAVOUR_CHOICES)
+    status = ChoiceDisplayField(Image.STATUS_CHOICES)
 
     class Meta:
         model = Image
         fields = ('image_id', 'device_name', 'distro_name', 'flavour', 'started_at', 'finished_at',
                   'status', 'notes', )
 
-    def get_flavour(self, obj):  # pylint: disable=no-self-use
-        """Returns the image flavour. """
-
-        return obj.get_flavour_display()
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
 
-    def get_status(self, obj):  # pylint: disable=no-self-use
-        """Returns the image status. """
+        super().__init__(*args, **kwargs)
 
-        return obj.get_status_display()
+        if fields is not None:
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
 
 
 class ImageDeleteSerializer(serializers.Serializer):  # pylint: disable=abstract-method
@@ -32,24 +47,6 @@ class ImageDeleteSerializer(serializers.Serializer):  # pylint: disable=abstract
 
     image_id = serializers.UUIDField()
 
-    def __init__(self, *args, **kwargs):
-        self.user = kwargs.pop('current_user')
-
-        super().__init__(*args, **kwargs)
-
-    def validate_image_id(self, value):  # pylint: disable=no-self-use
-        """Validates if image with image exist and the current user has deleted image. """
-
-        try:
-            image = Image.objects.get(image_id=value)
-        except Image.DoesNotExist as does_not_exist:
-            raise serializers.ValidationError('Image does not exist.') from does_not_exist
-
-        if image.user != self.user:
-            raise serializers.ValidationError('Current user does not have current image.')
-
-        return value
-
 
 class ImageNotesUpdateSerializer(serializers.Serializer):  # pylint: disable=abstract-method
     """Serializes both the image_id and the notes provided by the current user to update their
@@ -58,20 +55,26 @@ class ImageNotesUpdateSerializer(serializers.Serializer):  # pylint: disable=abs
     image_id = serializers.UUIDField()
     notes = serializers.CharField(allow_blank=True)
 
-    def __init__(self, *args, **kwargs):
-        self.user = kwargs.pop('current_user')
 
-        super().__init__(*args, **kwargs)
+class ImageBatchSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Serializes the list of the image ids provided by the current user to change a number of
+    their images at once. """
 
-    def validate_image_id(self, value):  # pylint: disable=no-self-use
-        """Validates if image with image_id exist and the current user has updated image. """
+    image_ids = serializers.ListField(child=serializers.UUIDField(), allow_empty=False)
 
-        try:
-            image = Image.objects.get(image_id=value)
-        except Image.DoesNotExist as does_not_exist:
-            raise serializers.ValidationError('Image does not exist.') from does_not_exist
+    def validate_image_ids(self, value):  # pylint: disable=no-self-use
+        """Checks that the batch is not too large. """
 
-        if image.user != self.user:
-            raise serializers.ValidationError('Current user does not have current image.')
+        if len(value) > settings.IMAGES_BATCH_MAX_SIZE:
+            raise serializers.ValidationError(
+                f'Ensure this field has no more than {settings.IMAGES_BATCH_MAX_SIZE} elements.'
+            )
 
         return value
+
+
+class ImageBatchNotesUpdateSerializer(ImageBatchSerializer):  # pylint: disable=abstract-method
+    """Serializes both the list of the image ids and the notes provided by the current user to
+    update the notes of a number of their images at once. """
+
+    notes = serializers.CharField(allow_blank=True)
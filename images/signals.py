@@ -0,0 +1,31 @@
+"""Signals for the CusDeb API Images application. """
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from images.models import Image, ImageListVersion
+
+# The fields which are not shown in the images list, so changing them doesn't change the list.
+UNLISTED_FIELDS = {'build_log_size', 'build_log_checksum'}
+
+
+@receiver(post_save, sender=Image)
+def bump_image_list_version_on_save(sender,  # pylint: disable=unused-argument
+                                    instance, update_fields, **_kwargs):
+    """Bumps the version of the images list of the image owner unless only the fields which are
+    not in the list have changed.
+    """
+
+    if update_fields and set(update_fields) <= UNLISTED_FIELDS:
+        return
+
+    ImageListVersion.objects.bump([instance.user_id])
+
+
+@receiver(post_delete, sender=Image)
+def bump_image_list_version_on_delete(sender,  # pylint: disable=unused-argument
+                                      instance, **_kwargs):
+    """Bumps the version of the images list of the image owner. """
+
+    # The image might be deleted along with its owner.
+    ImageListVersion.objects.bump([instance.user_id], create_missing=False)
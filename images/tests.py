@@ -1,10 +1,26 @@
 """Tests the CusDeb API Images application. """
 
+import gzip
+import io
 import json
+import os
+import tempfile
+import zlib
+from datetime import timedelta
+from unittest import mock
 
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import override_settings
 from django.urls import reverse
+from django.utils.http import http_date
+from django.utils.timezone import now
 from rest_framework.views import status
 
+from images import devices
+from images.models import BuildLogChunk, Image, ImageListVersion
 from util.base_test import BaseSingleUserTest
 
 
@@ -22,3 +38,724 @@ class InitStageTest(BaseSingleUserTest):
                                    HTTP_AUTHORIZATION=header)
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_listing_devices_conditionally(self):
+        url = reverse('list-devices', kwargs={'version': 'v1'})
+        response = self.client.get(url)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_listing_devices_compressed(self):
+        url = reverse('list-devices', kwargs={'version': 'v1'})
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(json.loads(gzip.decompress(response.content)), settings.DEVICES_LIST)
+
+    def test_listing_devices_compressed_conditionally(self):
+        url = reverse('list-devices', kwargs={'version': 'v1'})
+        response = self.client.get(url)
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertNotEqual(response['ETag'], etag)
+
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=response['ETag'])
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_listing_devices_not_accepting_gzip(self):
+        url = reverse('list-devices', kwargs={'version': 'v1'})
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(json.loads(response.content), settings.DEVICES_LIST)
+
+    def test_reloading_devices(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            stamp = os.path.join(tmp_dir, 'devices.reload')
+            with override_settings(DEVICES_RELOAD_STAMP=stamp, DEVICES_RELOAD_CHECK_INTERVAL=0):
+                catalogue = devices.get_catalogue()
+                self.assertIs(devices.get_catalogue(), catalogue)
+
+                call_command('reload_devices', stdout=io.StringIO())
+
+                self.assertIsNot(devices.get_catalogue(), catalogue)
+                self.assertEqual(devices.get_catalogue().etag, catalogue.etag)
+
+
+class DevicesTest(BaseSingleUserTest):
+    """Tests querying the devices. """
+
+    def test_querying_devices(self):
+        url = reverse('devices', kwargs={'version': 'v1'})
+        response = self.client.get(url, {'vendor': 'raspberry pi', 'flavour': 'mender'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        devices_list = json.loads(response.content)
+        self.assertEqual(list(devices_list), ['rpi-3-b'])
+        self.assertEqual(list(devices_list['rpi-3-b']['distros']), ['raspberrypios-buster-armhf'])
+
+    def test_querying_devices_by_architecture_and_distro(self):
+        url = reverse('devices', kwargs={'version': 'v1'})
+        response = self.client.get(url, {'arch': 'arm64', 'distro': 'Ubuntu'})
+
+        devices_list = json.loads(response.content)
+        self.assertEqual(list(devices_list), ['rpi-3-b'])
+        self.assertEqual(list(devices_list['rpi-3-b']['distros']), ['ubuntu-bionic-arm64'])
+
+    def test_querying_devices_without_criteria(self):
+        url = reverse('devices', kwargs={'version': 'v1'})
+        response = self.client.get(url)
+
+        self.assertEqual(json.loads(response.content), settings.DEVICES_LIST)
+
+    def test_querying_devices_without_matches(self):
+        url = reverse('devices', kwargs={'version': 'v1'})
+        response = self.client.get(url, {'vendor': 'orange pi', 'flavour': 'mender'})
+
+        self.assertEqual(json.loads(response.content), {})
+
+    def test_getting_device(self):
+        url = reverse('device', kwargs={'version': 'v1', 'device_id': 'opi-zero'})
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(response.content), settings.DEVICES_LIST['opi-zero'])
+
+    def test_getting_non_existent_device(self):
+        url = reverse('device', kwargs={'version': 'v1', 'device_id': 'non-existent'})
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class BuildQueueTest(BaseSingleUserTest):
+    """Tests claiming the pending images by the builders. """
+
+    def setUp(self):
+        super().setUp()
+
+        self._image_counter = 0
+
+    def _create_images(self, number, image_status=Image.PENDING, **kwargs):
+        images = []
+        for _ in range(number):
+            self._image_counter += 1
+            images.append(Image.objects.create(
+                image_id=f'00000000-0000-0000-0000-{self._image_counter:012}',
+                device_name='rpi-3-b', distro_name='ubuntu-focal-armhf', status=image_status,
+                **kwargs,
+            ))
+
+        return images
+
+    def test_getting_any_image(self):
+        image = self._create_images(2)[0]
+
+        claimed = Image.objects.get_any()
+
+        self.assertEqual(claimed.pk, image.pk)
+        self.assertEqual(claimed.status, Image.BUILDING)
+        self.assertEqual(Image.objects.get(pk=image.pk).status, Image.BUILDING)
+
+    def test_getting_any_image_when_nothing_is_pending(self):
+        self._create_images(1, image_status=Image.SUCCEEDED)
+
+        self.assertIsNone(Image.objects.get_any())
+
+    def test_getting_many_images(self):
+        self._create_images(5)
+
+        claimed = Image.objects.get_many(3)
+
+        self.assertEqual(len(claimed), 3)
+        self.assertEqual(Image.objects.filter(status=Image.BUILDING).count(), 3)
+        self.assertEqual(len(Image.objects.get_many(3)), 2)
+        self.assertEqual(Image.objects.get_many(3), [])
+
+    def test_getting_images_by_priority(self):
+        low = self._create_images(1, priority=Image.LOW_PRIORITY)[0]
+        normal = self._create_images(1, priority=Image.NORMAL_PRIORITY)[0]
+        high = self._create_images(1, priority=Image.HIGH_PRIORITY)[0]
+
+        claimed = Image.objects.get_many(3)
+
+        self.assertEqual([image.pk for image in claimed], [high.pk, normal.pk, low.pk])
+
+    def test_getting_images_taking_turns_between_users(self):
+        first_user = User.objects.get(username=self._user['username'])
+        second_user = User.objects.create_user(username='another.user', password='secret',
+                                               email='another.user@domain.com')
+        first_images = self._create_images(3, user=first_user)
+        second_images = self._create_images(2, user=second_user)
+
+        claimed = Image.objects.get_many(5)
+
+        self.assertEqual([image.pk for image in claimed], [
+            first_images[0].pk, second_images[0].pk,
+            first_images[1].pk, second_images[1].pk,
+            first_images[2].pk,
+        ])
+
+    def test_getting_images_by_plan(self):
+        paid_user = User.objects.get(username=self._user['username'])
+        paid_user.person.props = {'plan': 'paid'}
+        paid_user.person.save(update_fields=['props'])
+        free_user = User.objects.create_user(username='another.user', password='secret',
+                                             email='another.user@domain.com')
+
+        anonymous = self._create_images(1)[0]
+        free = self._create_images(1, user=free_user)[0]
+        paid = self._create_images(1, user=paid_user)[0]
+
+        self.assertEqual([image.priority for image in (anonymous, free, paid)],
+                         [Image.LOW_PRIORITY, Image.NORMAL_PRIORITY, Image.HIGH_PRIORITY])
+        claimed = Image.objects.get_many(3)
+        self.assertEqual([image.pk for image in claimed], [paid.pk, free.pk, anonymous.pk])
+
+    def test_inserting_images_bypassing_save(self):
+        user = User.objects.get(username=self._user['username'])
+        Image.objects.bulk_create([
+            Image(user=user, image_id='00000000-0000-0000-0000-000000000001',
+                  device_name='rpi-3-b', distro_name='ubuntu-focal-armhf', status=Image.PENDING),
+        ])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'INSERT INTO images_image (image_id, device_name, distro_name, flavour, '
+                'created_at, status, turn, queued_at, notes, build_log_size, build_log_checksum, '
+                "props) VALUES ('00000000-0000-0000-0000-000000000002', 'rpi-3-b', "
+                "'ubuntu-focal-armhf', 'C', now(), 'P', 0, now(), '', 0, 0, '{}')"
+            )
+
+        self.assertEqual([image.priority for image in Image.objects.order_by('image_id')],
+                         [Image.NORMAL_PRIORITY, Image.NORMAL_PRIORITY])
+
+    def test_getting_requeued_images_after_waiting_ones(self):
+        first_user = User.objects.get(username=self._user['username'])
+        second_user = User.objects.create_user(username='another.user', password='secret',
+                                               email='another.user@domain.com')
+        failed = self._create_images(1, image_status=Image.FAILED, user=first_user)[0]
+        waiting = self._create_images(1, user=second_user)[0]
+
+        Image.objects.requeue_owned(first_user.pk, [failed.image_id])
+        pending = self._create_images(1, user=first_user)[0]
+
+        claimed = Image.objects.get_many(3)
+
+        self.assertEqual([image.pk for image in claimed], [waiting.pk, failed.pk, pending.pk])
+
+
+class BuildLogTest(BaseSingleUserTest):
+    """Tests storing and reading the build logs. """
+
+    def setUp(self):
+        super().setUp()
+
+        self._image = Image.objects.create(image_id='00000000-0000-0000-0000-000000000001',
+                                           device_name='rpi-3-b',
+                                           distro_name='ubuntu-focal-armhf')
+
+    def test_appending_build_log(self):
+        self._image.append_build_log('first line\n')
+        self._image.append_build_log(b'second line\n')
+
+        image = Image.objects.get(pk=self._image.pk)
+        self.assertEqual(image.build_log_size, 23)
+        self.assertEqual(image.build_log_checksum, zlib.crc32(b'first line\nsecond line\n'))
+        self.assertEqual(b''.join(image.read_build_log()), b'first line\nsecond line\n')
+
+    def test_reading_build_log_range(self):
+        self._image.append_build_log('first line\n')
+        self._image.append_build_log('second line\n')
+
+        self.assertEqual(b''.join(self._image.read_build_log(6)), b'line\nsecond line\n')
+        self.assertEqual(b''.join(self._image.read_build_log(6, 13)), b'line\nse')
+        self.assertEqual(b''.join(self._image.read_build_log(11, 17)), b'second')
+        self.assertEqual(b''.join(self._image.read_build_log(23)), b'')
+
+    def test_storing_build_log(self):
+        self._image.append_build_log('old log')
+        self._image.store_build_log('new log')
+
+        image = Image.objects.get(pk=self._image.pk)
+        self.assertEqual(image.build_log_size, 7)
+        self.assertEqual(b''.join(image.read_build_log()), b'new log')
+
+
+class BuildLogViewTest(BaseSingleUserTest):
+    """Tests the endpoint streaming the build logs. """
+
+    def setUp(self):
+        super().setUp()
+
+        self._image = Image.objects.create(
+            user=User.objects.get(username=self._user['username']),
+            image_id='00000000-0000-0000-0000-000000000001', device_name='rpi-3-b',
+            distro_name='ubuntu-focal-armhf', status=Image.SUCCEEDED,
+        )
+        self._image.append_build_log('first line\n')
+        self._image.append_build_log('second line\n')
+        self._url = reverse('image-build-log', kwargs={
+            'version': 'v1',
+            'image_id': self._image.image_id,
+        })
+
+    def test_getting_build_log(self):
+        response = self.client.get(self._url, HTTP_AUTHORIZATION=self._get_auth_header())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), b'first line\nsecond line\n')
+        self.assertEqual(response['X-Build-Log-Next-Offset'], '23')
+        self.assertEqual(response['X-Image-Status'], 'Succeeded')
+
+    def test_getting_build_log_from_offset(self):
+        response = self.client.get(self._url, {'offset': 11},
+                                   HTTP_AUTHORIZATION=self._get_auth_header())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), b'second line\n')
+
+    def test_getting_build_log_range(self):
+        response = self.client.get(self._url, HTTP_AUTHORIZATION=self._get_auth_header(),
+                                   HTTP_RANGE='bytes=6-16')
+
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], 'bytes 6-16/23')
+        self.assertEqual(b''.join(response.streaming_content), b'line\nsecond')
+
+    def test_getting_build_log_unsatisfiable_range(self):
+        response = self.client.get(self._url, HTTP_AUTHORIZATION=self._get_auth_header(),
+                                   HTTP_RANGE='bytes=23-')
+
+        self.assertEqual(response.status_code, status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        self.assertEqual(response['Content-Range'], 'bytes */23')
+
+    def test_getting_compressed_build_log(self):
+        response = self.client.get(self._url, HTTP_AUTHORIZATION=self._get_auth_header(),
+                                   HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(b''.join(response.streaming_content)),
+                         b'first line\nsecond line\n')
+
+    def test_getting_build_log_suffix_range(self):
+        response = self.client.get(self._url, HTTP_AUTHORIZATION=self._get_auth_header(),
+                                   HTTP_RANGE='bytes=-5')
+
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], 'bytes 18-22/23')
+        self.assertEqual(b''.join(response.streaming_content), b'line\n')
+
+    def test_getting_build_log_invalid_range(self):
+        for range_header in ('bytes=16-6', 'bytes=0-1,5-6', 'lines=1-2', 'bytes=-'):
+            response = self.client.get(self._url, HTTP_AUTHORIZATION=self._get_auth_header(),
+                                       HTTP_RANGE=range_header)
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('Content-Range', response)
+            self.assertEqual(b''.join(response.streaming_content), b'first line\nsecond line\n')
+
+    def test_getting_build_log_not_accepting_gzip(self):
+        for accept_encoding in ('gzip;q=0, deflate', 'identity', '*;q=1, gzip;q=0.0'):
+            response = self.client.get(self._url, HTTP_AUTHORIZATION=self._get_auth_header(),
+                                       HTTP_ACCEPT_ENCODING=accept_encoding)
+
+            self.assertNotIn('Content-Encoding', response)
+            self.assertEqual(b''.join(response.streaming_content), b'first line\nsecond line\n')
+
+    @override_settings(BUILD_LOG_POLL_INTERVAL=2)
+    def test_following_build_log(self):
+        self._image.change_status_to(Image.BUILDING)
+
+        response = self.client.get(self._url, {'offset': 23},
+                                   HTTP_AUTHORIZATION=self._get_auth_header())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(b''.join(response.streaming_content), b'')
+        self.assertEqual(response['X-Build-Log-Next-Offset'], '23')
+        self.assertEqual(response['X-Build-Log-Poll-Interval'], '2')
+        self.assertEqual(response['X-Image-Status'], 'Building')
+
+    def test_getting_build_log_of_another_user(self):
+        self._image.user = User.objects.create_user(username='another.user', password='secret',
+                                                    email='another.user@domain.com')
+        self._image.save(update_fields=['user'])
+
+        response = self.client.get(self._url, HTTP_AUTHORIZATION=self._get_auth_header())
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ListImagesTest(BaseSingleUserTest):
+    """Tests listing the images of the user. """
+
+    def setUp(self):
+        super().setUp()
+
+        user = User.objects.get(username=self._user['username'])
+        for i in range(5):
+            Image.objects.create(user=user, image_id=f'00000000-0000-0000-0000-{i:012}',
+                                 device_name='rpi-3-b', distro_name='ubuntu-focal-armhf',
+                                 status=Image.SUCCEEDED)
+        Image.objects.create(user=user, image_id='00000000-0000-0000-0000-000000000005',
+                             device_name='rpi-3-b', distro_name='ubuntu-focal-armhf')
+        self._url = reverse('images-all', kwargs={'version': 'v1'})
+
+    def test_listing_images(self):
+        response = self.client.get(self._url, HTTP_AUTHORIZATION=self._get_auth_header())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([image['image_id'][-1] for image in response.data['results']],
+                         ['4', '3', '2', '1', '0'])
+        self.assertIsNone(response.data['next'])
+
+    def test_listing_images_page_by_page(self):
+        header = self._get_auth_header()
+        image_ids = []
+        url = f'{self._url}?page_size=2'
+        while url:
+            response = self.client.get(url, HTTP_AUTHORIZATION=header)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+
+            image_ids.extend(image['image_id'][-1] for image in response.data['results'])
+            url = response.data['next']
+
+        self.assertEqual(image_ids, ['4', '3', '2', '1', '0'])
+
+    @override_settings(IMAGES_PAGE_SIZE=2, IMAGES_MAX_PAGE_SIZE=3)
+    def test_listing_images_with_configured_page_size(self):
+        header = self._get_auth_header()
+        response = self.client.get(self._url, HTTP_AUTHORIZATION=header)
+
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(self._url, {'page_size': 10}, HTTP_AUTHORIZATION=header)
+
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_listing_images_created_at_same_time_page_by_page(self):
+        Image.objects.update(created_at=now())
+        header = self._get_auth_header()
+        response = self.client.get(self._url, {'page_size': 2}, HTTP_AUTHORIZATION=header)
+        first_page = [image['image_id'][-1] for image in response.data['results']]
+
+        response = self.client.get(response.data['next'], HTTP_AUTHORIZATION=header)
+        second_page = [image['image_id'][-1] for image in response.data['results']]
+
+        response = self.client.get(response.data['previous'], HTTP_AUTHORIZATION=header)
+
+        self.assertEqual(first_page, ['4', '3'])
+        self.assertEqual(second_page, ['2', '1'])
+        self.assertEqual([image['image_id'][-1] for image in response.data['results']],
+                         first_page)
+        self.assertIsNone(response.data['previous'])
+
+    def test_listing_images_with_invalid_cursor(self):
+        response = self.client.get(self._url, {'cursor': 'cD1ub3QtYS1kYXRl'},
+                                   HTTP_AUTHORIZATION=self._get_auth_header())
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_listing_images_with_sparse_fieldset(self):
+        response = self.client.get(self._url, {'fields': 'image_id,status,flavour'},
+                                   HTTP_AUTHORIZATION=self._get_auth_header())
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'][0], {
+            'image_id': '00000000-0000-0000-0000-000000000004',
+            'status': 'Succeeded',
+            'flavour': 'Classic',
+        })
+
+    def test_listing_images_with_unknown_field(self):
+        response = self.client.get(self._url, {'fields': 'image_id,props'},
+                                   HTTP_AUTHORIZATION=self._get_auth_header())
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'fields': ['Unknown field: props.']})
+
+    def test_listing_images_conditionally(self):
+        header = self._get_auth_header()
+        response = self.client.get(self._url, HTTP_AUTHORIZATION=header)
+        image_list_etag = response['ETag']
+
+        response = self.client.get(self._url, HTTP_AUTHORIZATION=header,
+                                   HTTP_IF_NONE_MATCH=image_list_etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        response = self.client.get(self._url, {'fields': 'image_id'}, HTTP_AUTHORIZATION=header,
+                                   HTTP_IF_NONE_MATCH=image_list_etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        image = Image.objects.get(image_id='00000000-0000-0000-0000-000000000001')
+        image.change_status_to(Image.FAILED)
+        response = self.client.get(self._url, HTTP_AUTHORIZATION=header,
+                                   HTTP_IF_NONE_MATCH=image_list_etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], image_list_etag)
+
+    def test_listing_images_conditionally_after_deleting_image(self):
+        header = self._get_auth_header()
+        response = self.client.get(self._url, HTTP_AUTHORIZATION=header)
+        image_list_etag = response['ETag']
+
+        Image.objects.get(image_id='00000000-0000-0000-0000-000000000001').delete()
+        response = self.client.get(self._url, HTTP_AUTHORIZATION=header,
+                                   HTTP_IF_NONE_MATCH=image_list_etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 4)
+
+    def test_listing_images_modified_since(self):
+        header = self._get_auth_header()
+        changed_at = ImageListVersion.objects.get().changed_at
+        # The images have been changed within the current second.
+        with mock.patch('images.views.now', return_value=changed_at):
+            response = self.client.get(self._url, HTTP_AUTHORIZATION=header,
+                                       HTTP_IF_MODIFIED_SINCE=http_date(changed_at.timestamp()))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.has_header('Last-Modified'))
+
+        ImageListVersion.objects.update(changed_at=now() - timedelta(minutes=1))
+        response = self.client.get(self._url, HTTP_AUTHORIZATION=header)
+        last_modified = response['Last-Modified']
+        response = self.client.get(self._url, HTTP_AUTHORIZATION=header,
+                                   HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class ImageChangingTest(BaseSingleUserTest):
+    """Tests deleting images and updating their notes. """
+
+    def setUp(self):
+        super().setUp()
+
+        self._image = Image.objects.create(
+            user=User.objects.get(username=self._user['username']),
+            image_id='00000000-0000-0000-0000-000000000001', device_name='rpi-3-b',
+            distro_name='ubuntu-focal-armhf', status=Image.SUCCEEDED,
+        )
+        self._image.append_build_log('build log')
+        self._another_image = Image.objects.create(
+            user=User.objects.create_user(username='another.user', password='secret',
+                                          email='another.user@domain.com'),
+            image_id='00000000-0000-0000-0000-000000000002', device_name='rpi-3-b',
+            distro_name='ubuntu-focal-armhf', status=Image.SUCCEEDED,
+        )
+
+    def _delete(self, image_id):
+        url = reverse('image-delete', kwargs={'version': 'v1'})
+        return self.client.delete(url, data=json.dumps({'image_id': image_id}),
+                                  content_type='application/json',
+                                  HTTP_AUTHORIZATION=self._get_auth_header())
+
+    def _update_notes(self, image_id, notes):
+        url = reverse('image-notes-update', kwargs={'version': 'v1'})
+        return self.client.put(url, data=json.dumps({'image_id': image_id, 'notes': notes}),
+                               content_type='application/json',
+                               HTTP_AUTHORIZATION=self._get_auth_header())
+
+    def test_deleting_image(self):
+        response = self._delete(self._image.image_id)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Image.objects.filter(pk=self._image.pk).exists())
+        self.assertFalse(BuildLogChunk.objects.filter(image_id=self._image.pk).exists())
+
+    def test_deleting_image_by_non_canonical_id(self):
+        response = self._delete('00000000000000000000000000000001')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Image.objects.filter(pk=self._image.pk).exists())
+
+    def test_deleting_image_changes_images_list_etag(self):
+        url = reverse('images-all', kwargs={'version': 'v1'})
+        image_list_etag = self.client.get(url, HTTP_AUTHORIZATION=self._get_auth_header())['ETag']
+
+        self._delete(self._image.image_id)
+        response = self.client.get(url, HTTP_AUTHORIZATION=self._get_auth_header(),
+                                   HTTP_IF_NONE_MATCH=image_list_etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], image_list_etag)
+        self.assertEqual(response.data['results'], [])
+
+    def test_deleting_image_of_another_user(self):
+        response = self._delete(self._another_image.image_id)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertTrue(Image.objects.filter(pk=self._another_image.pk).exists())
+
+    def test_deleting_non_existent_image(self):
+        response = self._delete('00000000-0000-0000-0000-000000000003')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deleting_image_with_invalid_id(self):
+        response = self._delete('invalid')
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_updating_image_notes(self):
+        response = self._update_notes(self._image.image_id, 'Some notes')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Image.objects.get(pk=self._image.pk).notes, 'Some notes')
+
+    def test_updating_image_notes_of_another_user(self):
+        response = self._update_notes(self._another_image.image_id, 'Some notes')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Image.objects.get(pk=self._another_image.pk).notes, '')
+
+    def test_updating_image_notes_by_non_canonical_id(self):
+        self._image.image_id = '0000000a-0000-0000-0000-000000000001'
+        self._image.save(update_fields=['image_id'])
+
+        response = self._update_notes('0000000A000000000000000000000001', 'Some notes')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Image.objects.get(pk=self._image.pk).notes, 'Some notes')
+
+    def test_updating_notes_of_another_user_by_non_canonical_id(self):
+        response = self._update_notes('00000000000000000000000000000002', 'Some notes')
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_updating_notes_of_non_existent_image(self):
+        response = self._update_notes('00000000-0000-0000-0000-000000000003', 'Some notes')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ImageBatchTest(BaseSingleUserTest):
+    """Tests changing a number of images at once. """
+
+    def setUp(self):
+        super().setUp()
+
+        user = User.objects.get(username=self._user['username'])
+        another_user = User.objects.create_user(username='another.user', password='secret',
+                                                email='another.user@domain.com')
+        self._image_ids = {}
+        for n, (owner, image_status) in enumerate((
+                (user, Image.SUCCEEDED),
+                (user, Image.FAILED),
+                (user, Image.INTERRUPTED),
+                (another_user, Image.FAILED),
+        )):
+            image = Image.objects.create(
+                user=owner, image_id=f'00000000-0000-0000-0000-{n:012}', device_name='rpi-3-b',
+                distro_name='ubuntu-focal-armhf', status=image_status,
+            )
+            image.append_build_log('build log')
+            self._image_ids[(owner, image_status)] = image.image_id
+
+        self._succeeded = self._image_ids[(user, Image.SUCCEEDED)]
+        self._failed = self._image_ids[(user, Image.FAILED)]
+        self._interrupted = self._image_ids[(user, Image.INTERRUPTED)]
+        self._another_users = self._image_ids[(another_user, Image.FAILED)]
+        self._non_existent = '00000000-0000-0000-0000-000000000099'
+
+    def _post(self, url_name, data):
+        url = reverse(url_name, kwargs={'version': 'v1'})
+        return self.client.post(url, data=json.dumps(data), content_type='application/json',
+                                HTTP_AUTHORIZATION=self._get_auth_header())
+
+    def test_batch_deleting(self):
+        response = self._post('images-batch-delete', {
+            'image_ids': [self._succeeded, self._failed, self._another_users, self._non_existent],
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'results': {
+            self._succeeded: 'deleted',
+            self._failed: 'deleted',
+            self._another_users: 'forbidden',
+            self._non_existent: 'not_found',
+        }})
+        self.assertEqual(
+            set(Image.objects.values_list('image_id', flat=True)),
+            {self._interrupted, self._another_users},
+        )
+        self.assertEqual(BuildLogChunk.objects.count(), 2)
+
+    def test_batch_updating_notes(self):
+        response = self._post('images-batch-notes-update', {
+            'image_ids': [self._succeeded, self._failed, self._another_users],
+            'notes': 'Some notes',
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'results': {
+            self._succeeded: 'updated',
+            self._failed: 'updated',
+            self._another_users: 'forbidden',
+        }})
+        self.assertEqual(
+            dict(Image.objects.values_list('image_id', 'notes')),
+            {
+                self._succeeded: 'Some notes',
+                self._failed: 'Some notes',
+                self._interrupted: '',
+                self._another_users: '',
+            },
+        )
+
+    def test_batch_requeueing(self):
+        response = self._post('images-batch-requeue', {
+            'image_ids': [self._succeeded, self._failed, self._interrupted, self._another_users],
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'results': {
+            self._succeeded: 'conflict',
+            self._failed: 'requeued',
+            self._interrupted: 'requeued',
+            self._another_users: 'forbidden',
+        }})
+
+        for image_id, image_status in ((self._succeeded, Image.SUCCEEDED),
+                                       (self._failed, Image.PENDING),
+                                       (self._interrupted, Image.PENDING),
+                                       (self._another_users, Image.FAILED)):
+            image = Image.objects.get(image_id=image_id)
+            self.assertEqual(image.status, image_status)
+            expected_log = b'' if image_status == Image.PENDING else b'build log'
+            self.assertEqual(b''.join(image.read_build_log()), expected_log)
+
+    def test_batch_with_duplicate_image_ids(self):
+        response = self._post('images-batch-delete', {
+            'image_ids': [self._succeeded, self._succeeded.upper()],
+        })
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'results': {self._succeeded: 'deleted'}})
+
+    def test_batch_with_invalid_image_ids(self):
+        for image_ids in ([], ['invalid'], 'invalid'):
+            response = self._post('images-batch-delete', {'image_ids': image_ids})
+
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_too_large_batch(self):
+        image_ids = [f'00000000-0000-0000-0000-{n:012}' for n in range(3)]
+        with self.settings(IMAGES_BATCH_MAX_SIZE=2):
+            response = self._post('images-batch-delete', {'image_ids': image_ids})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
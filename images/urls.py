@@ -2,11 +2,26 @@
 
 from django.urls import re_path
 
-from .views import ImageDeleteView, ImageNotesUpdateView, ListImagesView
+from .views import (
+    ImageBatchDeleteView,
+    ImageBatchNotesUpdateView,
+    ImageBatchRequeueView,
+    ImageBuildLogView,
+    ImageDeleteView,
+    ImageNotesUpdateView,
+    ListImagesView,
+)
 
 
 urlpatterns = [  # pylint: disable=invalid-name
+    # The batch endpoints go first since the patterns below aren't anchored at the start.
+    re_path('batch/delete/?$', ImageBatchDeleteView.as_view(), name='images-batch-delete'),
+    re_path('batch/update_notes/?$', ImageBatchNotesUpdateView.as_view(),
+            name='images-batch-notes-update'),
+    re_path('batch/requeue/?$', ImageBatchRequeueView.as_view(), name='images-batch-requeue'),
     re_path('all/?$', ListImagesView.as_view(), name='images-all'),
     re_path('delete/', ImageDeleteView.as_view(), name='image-delete'),
     re_path('update_notes/$', ImageNotesUpdateView.as_view(), name='image-notes-update'),
+    re_path('(?P<image_id>[0-9a-f-]{36})/log/?$', ImageBuildLogView.as_view(),
+            name='image-build-log'),
 ]
@@ -1,27 +1,151 @@
 """Module containing the class-based views related to the CusDeb API Images application. """
 
+import abc
+import hashlib
+import re
+
 from django.conf import settings
-from django.http import JsonResponse
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from django.utils.text import compress_sequence
+from django.utils.timezone import now
 from django.views import View
 from rest_framework import generics, permissions
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.views import status
 
-from .models import Image
+from .devices import get_catalogue
+from .models import Image, ImageListVersion
+from .pagination import ImageCursorPagination
 from .serializers import (
+    ImageBatchNotesUpdateSerializer,
+    ImageBatchSerializer,
     ImageDeleteSerializer,
     ImageNotesUpdateSerializer,
     ImageSerializer,
 )
 
+RANGE_RE = re.compile(r'^bytes=(?:(\d+)-(\d*)|-(\d+))$')
+
+
+def parse_range(range_header, size):
+    """Parses the Range header (only single byte ranges are supported) of a request for
+    a resource of the specified size. Returns the start and the exclusive end of the range, None
+    if the header is to be ignored (it's either missing or invalid) or (size, size) if the range
+    is not satisfiable.
+    """
+
+    match = RANGE_RE.match(range_header.replace(' ', ''))
+    if not match:
+        return None
+
+    first, last, suffix = match.groups()
+    if suffix is not None:
+        length = int(suffix)
+        return (max(size - length, 0), size) if length else (size, size)
+
+    start = int(first)
+    if last and int(last) < start:
+        return None
+    if start >= size:
+        return size, size
+
+    return start, min(int(last) + 1, size) if last else size
+
+
+def accepts_gzip(request):
+    """Returns whether the client accepts the gzip content-coding, taking into account the
+    quality values (gzip;q=0 means it's not acceptable).
+    """
+
+    qualities = {}
+    for coding in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, *params = [part.strip() for part in coding.split(';')]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip().lower() == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+
+    return qualities.get('gzip', qualities.get('*', 0.0)) > 0
+
+
+def image_not_owned_response(image_id):
+    """Returns the response explaining why the current user can't change the image: either it
+    doesn't exist or it belongs to another user.
+    """
+
+    if Image.objects.filter(image_id=image_id).exists():
+        return JsonResponse({'image_id': ['Current user does not have current image.']},
+                            status=status.HTTP_403_FORBIDDEN)
+
+    return JsonResponse({'image_id': ['Image does not exist.']},
+                        status=status.HTTP_404_NOT_FOUND)
+
 
 class ListDevicesView(View):
     """Returns the list of devices supported by CusDeb. """
 
-    def get(self, *_args, **_kwargs):
+    def get(self, request, *_args, **_kwargs):  # pylint: disable=no-self-use
         """GET-method for receiving devices list. """
 
-        return JsonResponse(settings.DEVICES_LIST)
+        catalogue = get_catalogue()
+        compress = accepts_gzip(request)
+        etag = catalogue.gzipped_etag if compress else catalogue.etag
+
+        response = get_conditional_response(request, etag=etag)
+        # pylint: disable=http-response-with-content-type-json
+        if response is None:
+            if compress:
+                response = HttpResponse(catalogue.gzipped_json, content_type='application/json')
+                response['Content-Encoding'] = 'gzip'
+            else:
+                response = HttpResponse(catalogue.json, content_type='application/json')
+
+        response['ETag'] = etag
+        patch_vary_headers(response, ('Accept-Encoding', ))
+
+        return response
+
+
+class DevicesView(View):
+    """Returns either the devices supported by CusDeb which match the criteria specified via the
+    query parameters (arch, vendor, distro and flavour) or a single device.
+    """
+
+    CRITERIA = ('arch', 'vendor', 'distro', 'flavour', )
+
+    def get(self, request, *_args, **kwargs):
+        """GET-method for querying devices. """
+
+        catalogue = get_catalogue()
+        validator = f'{catalogue.etag}:{request.get_full_path()}'
+        devices_etag = quote_etag(hashlib.sha1(validator.encode()).hexdigest())
+
+        response = get_conditional_response(request, etag=devices_etag)
+        if response is None:
+            device_id = kwargs.get('device_id')
+            if device_id:
+                device = catalogue.devices.get(device_id)
+                if device is None:
+                    return JsonResponse({'device_id': ['Device does not exist.']},
+                                        status=status.HTTP_404_NOT_FOUND)
+
+                response = JsonResponse(device)
+            else:
+                criteria = {name: request.GET.get(name) for name in self.CRITERIA}
+                response = JsonResponse(catalogue.query(**criteria))
+
+        response['ETag'] = devices_etag
+
+        return response
 
 
 class ListImagesView(generics.ListAPIView):
@@ -29,10 +153,61 @@ class ListImagesView(generics.ListAPIView):
 
     serializer_class = ImageSerializer
     permission_classes = (permissions.IsAuthenticated, )
+    pagination_class = ImageCursorPagination
+
+    def get(self, request, *args, **kwargs):
+        # The response depends on nothing but the images of the user and the request itself,
+        # so it can be validated without fetching and serializing the images.
+        version, changed_at = ImageListVersion.objects.get_version(request.user.id)
+        validator = (f'{request.user.id}:{version}:{request.get_full_path()}:'
+                     f'{request.META.get("HTTP_ACCEPT", "")}')
+        image_list_etag = quote_etag(hashlib.sha1(validator.encode()).hexdigest())
+        # Last-Modified has a resolution of one second, so it's neither sent nor checked until the
+        # second of the last change is over. Otherwise another change made within the same
+        # second would be hidden behind it and If-Modified-Since would be answered with 304.
+        last_modified = None
+        if changed_at and int(changed_at.timestamp()) < int(now().timestamp()):
+            last_modified = int(changed_at.timestamp())
+
+        response = get_conditional_response(request, etag=image_list_etag,
+                                            last_modified=last_modified)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+
+        response['ETag'] = image_list_etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+
+        return response
 
     def get_queryset(self):
         user = self.request.user
-        return Image.objects.without_undefined().filter(user=user)
+        # Fetch only the columns which are serialized (and the ones the pagination relies on).
+        return (Image.objects.without_undefined()
+                .filter(user=user)
+                .order_by('-created_at', '-id')
+                .values(*self.get_fields(), 'created_at', 'id'))
+
+    def get_fields(self):
+        """Returns the names of the fields requested via the 'fields' query parameter (all the
+        fields by default).
+        """
+
+        fields = self.request.query_params.get('fields')
+        if not fields:
+            return ImageSerializer.Meta.fields
+
+        fields = tuple(field.strip() for field in fields.split(','))
+        unknown_fields = set(fields) - set(ImageSerializer.Meta.fields)
+        if unknown_fields:
+            raise ValidationError({'fields': [f'Unknown field: {field}.'
+                                              for field in sorted(unknown_fields)]})
+
+        return fields
+
+    def get_serializer(self, *args, **kwargs):
+        kwargs['fields'] = self.get_fields()
+        return super().get_serializer(*args, **kwargs)
 
 
 class ImageDeleteView(generics.DestroyAPIView):
@@ -43,14 +218,15 @@ class ImageDeleteView(generics.DestroyAPIView):
     def delete(self, request, *args, **kwargs):
         image_id = request.data.get('image_id', '')
 
-        serializer = ImageDeleteSerializer(
-            data={'image_id': image_id},
-            current_user=request.user,
-        )
+        serializer = ImageDeleteSerializer(data={'image_id': image_id})
 
         if serializer.is_valid():
-            Image.objects.filter(image_id=image_id).delete()
-            return Response(status=status.HTTP_200_OK)
+            # The image ids are stored in the canonical form of UUIDs.
+            image_id = str(serializer.validated_data['image_id'])
+            if Image.objects.delete_owned(request.user.id, [image_id]):
+                return Response(status=status.HTTP_200_OK)
+
+            return image_not_owned_response(image_id)
 
         return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -64,13 +240,145 @@ class ImageNotesUpdateView(generics.UpdateAPIView):
         image_id = request.data.get('image_id', '')
         notes = request.data.get('notes', '')
 
-        serializer = ImageNotesUpdateSerializer(
-            data={'image_id': image_id, 'notes': notes},
-            current_user=request.user,
-        )
+        serializer = ImageNotesUpdateSerializer(data={'image_id': image_id, 'notes': notes})
 
         if serializer.is_valid():
-            Image.objects.filter(image_id=image_id).update(notes=notes)
-            return Response(status=status.HTTP_200_OK)
+            # The image ids are stored in the canonical form of UUIDs.
+            image_id = str(serializer.validated_data['image_id'])
+            if Image.objects.update_notes_owned(request.user.id, [image_id], notes):
+                return Response(status=status.HTTP_200_OK)
+
+            return image_not_owned_response(image_id)
 
         return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ImageBatchView(generics.GenericAPIView, metaclass=abc.ABCMeta):
+    """Base class for the views changing a number of images of the authenticated user at once.
+    The images are changed by one query and the response tells what happened to every one of
+    them: either the result of the change or 'not_found', 'forbidden' (the image belongs to
+    another user) or 'conflict' (the image can't be changed in its current state).
+    """
+
+    permission_classes = (permissions.IsAuthenticated, )
+    serializer_class = ImageBatchSerializer
+    result = None
+
+    def post(self, request, *_args, **_kwargs):
+        """POST-method for changing the images. """
+
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        data = serializer.validated_data
+        image_ids = list(dict.fromkeys(str(image_id) for image_id in data.pop('image_ids')))
+        with transaction.atomic():
+            changed_ids = self.change(request.user.id, image_ids, **data)
+
+            results = dict.fromkeys(image_ids, 'not_found')
+            results.update(dict.fromkeys(changed_ids, self.result))
+            unchanged = (Image.objects.filter(image_id__in=set(image_ids) - changed_ids)
+                         .values_list('image_id', 'user_id'))
+            for image_id, user_id in unchanged:
+                results[image_id] = 'conflict' if user_id == request.user.id else 'forbidden'
+
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @abc.abstractmethod
+    def change(self, user_id, image_ids, **kwargs):
+        """Changes the specified images which belong to the specified user and returns the set
+        of the ids of the changed images.
+        """
+
+
+class ImageBatchDeleteView(ImageBatchView):
+    """Deletes a number of images. """
+
+    result = 'deleted'
+
+    def change(self, user_id, image_ids, **kwargs):
+        return Image.objects.delete_owned(user_id, image_ids)
+
+
+class ImageBatchNotesUpdateView(ImageBatchView):
+    """Updates the notes of a number of images. """
+
+    serializer_class = ImageBatchNotesUpdateSerializer
+    result = 'updated'
+
+    def change(self, user_id, image_ids, **kwargs):
+        return Image.objects.update_notes_owned(user_id, image_ids, kwargs['notes'])
+
+
+class ImageBatchRequeueView(ImageBatchView):
+    """Puts a number of failed (or interrupted) images back into the build queue. """
+
+    result = 'requeued'
+
+    def change(self, user_id, image_ids, **kwargs):
+        return Image.objects.requeue_owned(user_id, image_ids)
+
+
+class ImageBuildLogView(generics.GenericAPIView):
+    """Streams the build log of an image. A part of the log can be requested either via the
+    'offset' query parameter or the Range header (only single byte ranges are supported). While
+    the image is being built, clients can tail the log by passing the value of the
+    X-Build-Log-Next-Offset header as the offset of the next request, which is sent after the
+    number of seconds in the X-Build-Log-Poll-Interval header. The requests never wait for new
+    output, so tailing the log doesn't hold up the workers.
+    """
+
+    permission_classes = (permissions.IsAuthenticated, )
+
+    def get(self, request, *_args, **kwargs):
+        """GET-method for receiving the build log. """
+
+        image = (Image.objects.only('status', 'build_log_size')
+                 .filter(image_id=kwargs['image_id'], user=request.user)
+                 .first())
+        if not image:
+            return JsonResponse({'image_id': ['Image does not exist.']},
+                                status=status.HTTP_404_NOT_FOUND)
+
+        # Don't serve what is appended while streaming so that the next offset is exact.
+        size = image.build_log_size
+        byte_range = parse_range(request.META.get('HTTP_RANGE', ''), size)
+        if byte_range is None:
+            offset = request.query_params.get('offset', '0')
+            if not offset.isdigit():
+                return JsonResponse({'offset': ['A non-negative integer is required.']},
+                                    status=status.HTTP_400_BAD_REQUEST)
+
+            start, end = min(int(offset), size), size
+        elif byte_range[0] >= size:
+            response = Response(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+        else:
+            start, end = byte_range
+
+        content = image.read_build_log(start, end)
+
+        # Byte ranges refer to the encoded content, so compress only the whole responses.
+        compress = byte_range is None and accepts_gzip(request)
+        if compress:
+            content = compress_sequence(content)
+
+        response = StreamingHttpResponse(
+            content,
+            status=status.HTTP_200_OK if byte_range is None else status.HTTP_206_PARTIAL_CONTENT,
+            content_type='text/plain; charset=utf-8',
+        )
+        response['Accept-Ranges'] = 'bytes'
+        response['X-Build-Log-Next-Offset'] = end
+        response['X-Image-Status'] = image.get_status_display()
+        if image.status in (Image.PENDING, Image.BUILDING):
+            response['X-Build-Log-Poll-Interval'] = settings.BUILD_LOG_POLL_INTERVAL
+        if byte_range is not None:
+            response['Content-Range'] = f'bytes {start}-{end - 1}/{size}'
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        patch_vary_headers(response, ('Accept-Encoding', ))
+
+        return response
@@ -2,7 +2,7 @@
 
 from django.contrib import admin
 
-from .models import EmailConfirmationToken, Person
+from .models import EmailConfirmationToken, OutgoingEmail, Person, RevokedToken
 
 
 class HiddenModelAdmin(admin.ModelAdmin):
@@ -15,4 +15,6 @@ class HiddenModelAdmin(admin.ModelAdmin):
 
 
 admin.site.register(EmailConfirmationToken, HiddenModelAdmin)
+admin.site.register(OutgoingEmail)
 admin.site.register(Person)
+admin.site.register(RevokedToken, HiddenModelAdmin)
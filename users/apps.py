@@ -10,3 +10,12 @@ class UsersConfig(AppConfig):
 
     def ready(self):
         import users.signals  # pylint: disable=unused-import,import-outside-toplevel
+        from users.emails import load_templates  # pylint: disable=import-outside-toplevel
+        from users.throttling import check_rates  # pylint: disable=import-outside-toplevel
+        from users.token_backend import (  # pylint: disable=import-outside-toplevel
+            install_token_backend,
+        )
+
+        load_templates()
+        check_rates()
+        install_token_backend()
@@ -1,16 +1,20 @@
 """URL configuration for the CusDeb API Users application. """
 
 from django.urls import re_path
-from rest_framework_simplejwt.views import (
-    TokenObtainPairView,
-    TokenRefreshView,
-)
 
-from .views import SignUpView
+from .views import (
+    IdentityTokenObtainPairView,
+    IdentityTokenRefreshView,
+    JWKSView,
+    SignUpView,
+    TokenRevokeView,
+)
 
 
 urlpatterns = [  # pylint: disable=invalid-name
     re_path('signup/?$', SignUpView.as_view(), name='sign-up'),
-    re_path('token/?$', TokenObtainPairView.as_view(), name='token-obtain-pair'),
-    re_path('token/refresh/?$', TokenRefreshView.as_view(), name='token-refresh'),
+    re_path('token/?$', IdentityTokenObtainPairView.as_view(), name='token-obtain-pair'),
+    re_path('token/refresh/?$', IdentityTokenRefreshView.as_view(), name='token-refresh'),
+    re_path('token/revoke/?$', TokenRevokeView.as_view(), name='token-revoke'),
+    re_path('jwks/?$', JWKSView.as_view(), name='jwks'),
 ]
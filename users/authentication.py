@@ -0,0 +1,143 @@
+"""Module containing the authentication classes of the CusDeb API. """
+
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import (
+    JWTAuthentication,
+    JWTTokenUserAuthentication,
+)
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+
+class UserCache:
+    """Cache of the users (along with their persons) the requests are authenticated on behalf
+    of. It consists of a per-process LRU cache of up to AUTH_USER_CACHE_SIZE users, which are
+    kept for AUTH_USER_CACHE_TTL seconds, and, if AUTH_USER_CACHE_ALIAS is set, of the specified
+    shared cache (memcached or Redis, for example).
+
+    Every user has a version stamp in the shared cache, which is bumped whenever the user or
+    their person is changed, and the cached users are keyed by it, so the changes are seen by
+    all the processes right away. Without the shared cache the changes made by the other
+    processes are seen after AUTH_USER_CACHE_TTL seconds.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = OrderedDict()
+
+    @staticmethod
+    def _get_shared_cache():
+        alias = settings.AUTH_USER_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    @staticmethod
+    def _get_version_key(user_id):
+        return f'auth-user-version:{user_id}'
+
+    @staticmethod
+    def _get_user_key(user_id, version):
+        return f'auth-user:{user_id}:{version}'
+
+    def get(self, user_id):
+        """Returns the user with the specified id or None if there is no such user. Every call
+        returns a new instance, so the instance can be changed safely.
+        """
+
+        shared_cache = self._get_shared_cache()
+        version = shared_cache.get(self._get_version_key(user_id), 0) if shared_cache else 0
+
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry and entry[0] == version and entry[1] > time.monotonic():
+                self._users.move_to_end(user_id)
+                return pickle.loads(entry[2])
+
+        data = shared_cache.get(self._get_user_key(user_id, version)) if shared_cache else None
+        if data is None:
+            user = User.objects.select_related('person').filter(pk=user_id).first()
+            if user is None:
+                return None
+
+            data = pickle.dumps(user, pickle.HIGHEST_PROTOCOL)
+            if shared_cache:
+                shared_cache.set(self._get_user_key(user_id, version), data,
+                                 settings.AUTH_USER_CACHE_TTL)
+
+        self._store(user_id, version, data)
+        return pickle.loads(data)
+
+    def _store(self, user_id, version, data):
+        if settings.AUTH_USER_CACHE_SIZE <= 0:
+            return
+
+        with self._lock:
+            expires_at = time.monotonic() + settings.AUTH_USER_CACHE_TTL
+            self._users[user_id] = (version, expires_at, data)
+            self._users.move_to_end(user_id)
+            while len(self._users) > settings.AUTH_USER_CACHE_SIZE:
+                self._users.popitem(last=False)
+
+    def invalidate(self, user_id):
+        """Drops the user with the specified id from the cache. It's done both right away and
+        when the current transaction is committed, so that the cache isn't filled with the
+        data which is about to change by a concurrent request in the meantime.
+        """
+
+        self._invalidate(user_id)
+        transaction.on_commit(lambda: self._invalidate(user_id))
+
+    def _invalidate(self, user_id):
+        with self._lock:
+            self._users.pop(user_id, None)
+
+        shared_cache = self._get_shared_cache()
+        if shared_cache:
+            version_key = self._get_version_key(user_id)
+            shared_cache.add(version_key, 0, None)
+            shared_cache.incr(version_key)
+
+    def clear(self):
+        """Drops all the users from the per-process cache. """
+
+        with self._lock:
+            self._users.clear()
+
+
+user_cache = UserCache()  # pylint: disable=invalid-name
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication which takes the users from the cache (see UserCache), so the
+    authenticated requests don't have to query the database for the user and their person.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as exc:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from exc
+
+        user = user_cache.get(user_id)
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        return user
+
+
+class IdentityTokenAuthentication(JWTTokenUserAuthentication):
+    """Stateless authentication for the identity-only endpoints (see WhoAmIView). The request
+    user is a TokenUser backed by the token, so the identity claims of the token (see
+    IdentityRefreshToken) are available without touching the database.
+    """
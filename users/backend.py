@@ -2,6 +2,7 @@
 
 from django.contrib.auth import get_user_model
 from django.contrib.auth.backends import ModelBackend
+from django.db.models import Q
 
 
 class CheckEmailConfirmationModelBackendMixin(ModelBackend):
@@ -11,55 +12,44 @@ class CheckEmailConfirmationModelBackendMixin(ModelBackend):
         return user.person.email_confirmed and super().user_can_authenticate(user)
 
 
-class CaseInsensitiveModelBackend(CheckEmailConfirmationModelBackendMixin, ModelBackend):
-    """Authentication backend class that allows case-insensitive login. """
+class UsernameOrEmailModelBackend(CheckEmailConfirmationModelBackendMixin, ModelBackend):
+    """Authentication backend class that allows case-insensitive login using either username or
+    email and password. The user is looked up by one query and the password is hashed once.
+    """
 
     def authenticate(self, request, username=None, password=None, **kwargs):
         user_model = get_user_model()
 
         if username is None:
-            username = kwargs.get(user_model.USERNAME_FIELD)
-
-        try:
-            username_field = f'{user_model.USERNAME_FIELD}__iexact'
-            # pylint: disable=protected-access
-            user = user_model._default_manager.get(**{username_field: username})
-        except user_model.DoesNotExist:
-            # Run the default password hasher once to reduce the timing
-            # difference between an existing and a non-existing user (see
-            # https://code.djangoproject.com/ticket/20760)
-            user_model().set_password(password)
-
-            return None
-        else:
-            if user.check_password(password) and self.user_can_authenticate(user):
-                return user
-
+            username = (kwargs.get(user_model.USERNAME_FIELD)
+                        or kwargs.get(user_model.EMAIL_FIELD))
+        if username is None or password is None:
             return None
 
-
-class EmailModelBackend(CheckEmailConfirmationModelBackendMixin, ModelBackend):
-    """Authentication backend class that allows login using email and password. """
-
-    def authenticate(self, request, username=None, password=None, **kwargs):
-        user_model = get_user_model()
-
-        if username is None:
-            username = kwargs.get(user_model.EMAIL_FIELD)
-
-        try:
-            email_field = f'{user_model.EMAIL_FIELD}__iexact'
-            # pylint: disable=protected-access
-            user = user_model._default_manager.get(**{email_field: username})
-        except user_model.DoesNotExist:
+        username_field = f'{user_model.USERNAME_FIELD}__iexact'
+        email_field = f'{user_model.EMAIL_FIELD}__iexact'
+        # pylint: disable=protected-access
+        users = list(
+            user_model._default_manager
+            .select_related('person')
+            .filter(Q(**{email_field: username}) | Q(**{username_field: username}))
+        )
+        if not users:
             # Run the default password hasher once to reduce the timing
             # difference between an existing and a non-existing user (see
             # https://code.djangoproject.com/ticket/20760)
             user_model().set_password(password)
 
             return None
-        else:
+
+        # The username of a user may be the email of another one, so the user the email belongs
+        # to takes precedence (the same way it used to when the users were looked up by email
+        # and then by username).
+        users.sort(
+            key=lambda user: getattr(user, user_model.EMAIL_FIELD).upper() != username.upper()
+        )
+        for user in users:
             if user.check_password(password) and self.user_can_authenticate(user):
                 return user
 
-            return None
+        return None
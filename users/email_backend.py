@@ -0,0 +1,186 @@
+"""Module containing the email backend which keeps the connections to the mail server alive and
+reuses them. The backend can be enabled via EMAIL_BACKEND=users.email_backend.PooledEmailBackend.
+"""
+
+import smtplib
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.mail.backends.smtp import EmailBackend
+
+_POOL = defaultdict(list)
+
+_POOL_LOCK = threading.Lock()
+
+
+class SendMetrics:
+    """Counters and latencies of the emails sent by the current process. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Resets all the counters. """
+
+        with self._lock:
+            self._counters = {
+                'sent': 0,
+                'failed': 0,
+                'connections_opened': 0,
+                'connections_reused': 0,
+                'reconnects': 0,
+            }
+            self._total_latency = 0.0
+            self._max_latency = 0.0
+
+    def increment(self, counter):
+        """Increments the specified counter. """
+
+        with self._lock:
+            self._counters[counter] += 1
+
+    def record_send(self, latency, succeeded):
+        """Records the outcome of sending an email and how long (in seconds) it took. """
+
+        with self._lock:
+            self._counters['sent' if succeeded else 'failed'] += 1
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+
+    def snapshot(self):
+        """Returns the counters along with the average and the maximum send latency (in
+        seconds).
+        """
+
+        with self._lock:
+            attempts = self._counters['sent'] + self._counters['failed']
+            return {
+                **self._counters,
+                'avg_latency': self._total_latency / attempts if attempts else 0.0,
+                'max_latency': self._max_latency,
+            }
+
+
+metrics = SendMetrics()  # pylint: disable=invalid-name
+
+
+def close_pooled_connections():
+    """Closes all the idle connections of the current process. """
+
+    with _POOL_LOCK:
+        connections = [connection for idle in _POOL.values() for connection, _ in idle]
+        _POOL.clear()
+
+    for connection in connections:
+        _quit(connection)
+
+
+def _quit(connection):
+    """Closes the connection to the mail server ignoring the errors since it may already be
+    closed by the server.
+    """
+
+    try:
+        connection.quit()
+    except (smtplib.SMTPException, OSError):
+        connection.close()
+
+
+class PooledEmailBackend(EmailBackend):
+    """SMTP email backend which, instead of closing the connections to the mail server, puts
+    them into a per-process pool (up to EMAIL_POOL_SIZE connections), so that the next emails
+    are sent without connecting, negotiating TLS and authenticating again. The connections
+    which have been idle for more than EMAIL_POOL_MAX_IDLE seconds are not reused, and if the
+    server drops a pooled connection anyway, the email is sent over a new one. The connections
+    which failed to send an email are dropped rather than pooled.
+    """
+
+    def _get_pool_key(self):
+        return (self.host, self.port, self.username, self.use_tls, self.use_ssl)
+
+    def open(self):
+        if self.connection:
+            return False
+
+        key = self._get_pool_key()
+        while True:
+            with _POOL_LOCK:
+                if not _POOL[key]:
+                    break
+                connection, returned_at = _POOL[key].pop()
+
+            if time.monotonic() - returned_at < settings.EMAIL_POOL_MAX_IDLE:
+                self.connection = connection
+                metrics.increment('connections_reused')
+                return True
+
+            _quit(connection)
+
+        opened = super().open()
+        if opened:
+            metrics.increment('connections_opened')
+
+        return opened
+
+    def close(self):
+        if self.connection is None:
+            return
+
+        connection, self.connection = self.connection, None
+        with _POOL_LOCK:
+            idle = _POOL[self._get_pool_key()]
+            if len(idle) < settings.EMAIL_POOL_SIZE:
+                idle.append((connection, time.monotonic()))
+                return
+
+        _quit(connection)
+
+    def _connect(self):
+        """Opens a new connection. """
+
+        if super().open():
+            metrics.increment('connections_opened')
+
+    def _drop(self):
+        """Closes the current connection without putting it into the pool. """
+
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _reconnect(self):
+        """Drops the current connection (which is closed by the server) and opens a new one. """
+
+        self._drop()
+
+        metrics.increment('reconnects')
+        self._connect()
+
+    def _send(self, email_message):
+        # Let the errors propagate to be able to retry, and only then obey fail_silently.
+        fail_silently, self.fail_silently = self.fail_silently, False
+        start = time.perf_counter()
+        try:
+            try:
+                if self.connection is None:
+                    # Reconnecting failed while sending the previous email.
+                    self._connect()
+                sent = super()._send(email_message)
+            except smtplib.SMTPServerDisconnected:
+                self._reconnect()
+                sent = super()._send(email_message)
+        except (smtplib.SMTPException, OSError):
+            # The state of the connection is unknown, so it mustn't be reused.
+            self._drop()
+            metrics.record_send(time.perf_counter() - start, succeeded=False)
+            if not fail_silently:
+                raise
+            return False
+        finally:
+            self.fail_silently = fail_silently
+
+        metrics.record_send(time.perf_counter() - start, succeeded=True)
+        return sent
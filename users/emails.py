@@ -0,0 +1,28 @@
+"""Module rendering the emails sent by the CusDeb API Users application. The templates of the
+emails are compiled once when the application is loaded, so rendering an email only comes down
+to substituting the context.
+"""
+
+from django.template.loader import get_template
+
+EMAILS = ('confirm_email', 'user_reset_password', )
+
+_TEMPLATES = {}
+
+
+def load_templates():
+    """Compiles the templates (both the plain text and the HTML ones) of all the emails. """
+
+    for email in EMAILS:
+        _TEMPLATES[email] = (get_template(f'email/{email}.txt'),
+                             get_template(f'email/{email}.html'))
+
+
+def render_email(email, context):
+    """Renders the specified email and returns both its plain text and HTML versions. """
+
+    if email not in _TEMPLATES:
+        load_templates()
+
+    txt_template, html_template = _TEMPLATES[email]
+    return txt_template.render(context), html_template.render(context)
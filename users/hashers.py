@@ -0,0 +1,56 @@
+"""Module containing the password hashers the cost of which is taken from the settings, so that
+it can be tuned for the hardware the API runs on. When the cost is changed, the passwords hashed
+with the previous one are rehashed as the users sign in.
+"""
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    Argon2PasswordHasher,
+    BCryptSHA256PasswordHasher,
+    PBKDF2PasswordHasher,
+)
+
+
+class TunablePBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    """PBKDF2 hasher doing PASSWORD_HASHER_PBKDF2_ITERATIONS iterations. """
+
+    @property
+    def iterations(self):
+        """The number of iterations. """
+
+        return settings.PASSWORD_HASHER_PBKDF2_ITERATIONS
+
+
+class TunableArgon2PasswordHasher(Argon2PasswordHasher):
+    """Argon2 hasher (requires argon2-cffi) the cost of which is defined by
+    PASSWORD_HASHER_ARGON2_TIME_COST, PASSWORD_HASHER_ARGON2_MEMORY_COST (in KiB) and
+    PASSWORD_HASHER_ARGON2_PARALLELISM.
+    """
+
+    @property
+    def time_cost(self):
+        """The number of iterations. """
+
+        return settings.PASSWORD_HASHER_ARGON2_TIME_COST
+
+    @property
+    def memory_cost(self):
+        """The memory size in KiB. """
+
+        return settings.PASSWORD_HASHER_ARGON2_MEMORY_COST
+
+    @property
+    def parallelism(self):
+        """The number of parallel threads. """
+
+        return settings.PASSWORD_HASHER_ARGON2_PARALLELISM
+
+
+class TunableBCryptSHA256PasswordHasher(BCryptSHA256PasswordHasher):
+    """bcrypt hasher (requires bcrypt) doing 2 ** PASSWORD_HASHER_BCRYPT_ROUNDS rounds. """
+
+    @property
+    def rounds(self):
+        """The logarithm of the number of rounds. """
+
+        return settings.PASSWORD_HASHER_BCRYPT_ROUNDS
@@ -0,0 +1,48 @@
+"""Management command measuring how long rendering the emails takes. """
+
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+
+from users.emails import EMAILS, render_email
+
+
+class Command(BaseCommand):
+    """Measures the cost of rendering the emails sent by the API (the ones sent on signing up
+    among others) both via the precompiled templates and via the template loaders.
+    """
+
+    help = 'Measures the cost of rendering the emails.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=10_000,
+                            help='Number of times every email is rendered.')
+
+    def handle(self, *args, **options):
+        context = {
+            'username': 'benchmark.user',
+            'email': 'benchmark.user@domain.com',
+            'confirm_email_url': f'{settings.BASE_SITE_URL}/confirm-email/?token=01234567',
+            'reset_password_url': f'{settings.BASE_SITE_URL}/reset-password/confirm/?token=0',
+            'base_site_url': settings.BASE_SITE_URL,
+            'site_name': settings.DEFAULT_SITE_NAME,
+            'expiry_time': settings.EMAIL_CONFIRMATION_TOKEN_TTL // 60,
+            'token_expiry_time': 24,
+        }
+
+        def render_via_loaders(email):
+            return (render_to_string(f'email/{email}.txt', context),
+                    render_to_string(f'email/{email}.html', context))
+
+        for email in EMAILS:
+            for title, render in (('precompiled', lambda email: render_email(email, context)),
+                                  ('loaders', render_via_loaders)):
+                start = time.perf_counter()
+                for _ in range(options['repeat']):
+                    render(email)
+                elapsed = time.perf_counter() - start
+
+                self.stdout.write(f'{email} ({title}): '
+                                  f'{elapsed / options["repeat"] * 1_000_000:.1f} us per email')
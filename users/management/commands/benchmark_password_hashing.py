@@ -0,0 +1,42 @@
+"""Management command measuring how fast the passwords are hashed. """
+
+import os
+import time
+
+from django.contrib.auth.hashers import get_hashers
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """Measures how many passwords per second one CPU core hashes with every hasher from
+    PASSWORD_HASHERS (with the cost from the settings). Since a sign in hashes the password once,
+    it's also the number of sign ins per second one uWSGI worker can handle at most.
+    """
+
+    help = 'Measures the throughput of the password hashers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=3,
+                            help='How long every hasher is measured.')
+
+    def handle(self, *args, **options):
+        cpu_count = os.cpu_count() or 1
+        self.stdout.write(f'{cpu_count} CPU cores')
+
+        for hasher in get_hashers():
+            try:
+                hasher.encode('password', hasher.salt())
+            except ValueError as exc:  # the library the hasher relies on is not installed
+                self.stdout.write(f'{hasher.algorithm}: skipped ({exc})')
+                continue
+
+            hashes = 0
+            start = time.perf_counter()
+            deadline = start + options['seconds']
+            while time.perf_counter() < deadline:
+                hasher.encode('password', hasher.salt())
+                hashes += 1
+            rate = hashes / (time.perf_counter() - start)
+
+            self.stdout.write(f'{hasher.algorithm}: {rate:,.1f} hashes/s per core, '
+                              f'{rate * cpu_count:,.1f} hashes/s on all the cores')
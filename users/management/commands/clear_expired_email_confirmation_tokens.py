@@ -0,0 +1,25 @@
+"""Management command deleting the expired email confirmation tokens. """
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.models import EmailConfirmationToken
+
+
+class Command(BaseCommand):
+    """Deletes the expired email confirmation tokens chunk by chunk. The command is supposed to
+    be run periodically (by cron, for example). The expired tokens are ignored by the API
+    anyway, so it's only about keeping the table small.
+    """
+
+    help = 'Deletes the expired email confirmation tokens.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.EMAIL_CONFIRMATION_TOKEN_PURGE_BATCH_SIZE,
+                            help='Number of tokens deleted at once.')
+
+    def handle(self, *args, **options):
+        deleted = EmailConfirmationToken.objects.delete_expired(options['batch_size'])
+
+        self.stdout.write(f'Deleted {deleted} expired email confirmation tokens.')
@@ -0,0 +1,86 @@
+"""Management command printing the query plans of the lookups of the users by their username or
+email.
+"""
+
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Q
+
+INDEXES = ('auth_user_username_upper_idx', 'auth_user_email_upper_idx', )
+
+
+class Rollback(Exception):
+    """Raised to roll back the benchmark data. """
+
+
+class Command(BaseCommand):
+    """Fills the User table with fake users (in a transaction which is rolled back at the end)
+    and prints the plans and the timings of the case-insensitive lookups the API runs on signing
+    up and signing in, with and without the indexes backing them.
+    """
+
+    help = 'Prints the query plans of the case-insensitive lookups of the users.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000,
+                            help='Number of fake users to create.')
+        parser.add_argument('--repeat', type=int, default=100,
+                            help='Number of times every lookup is timed.')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._populate(options['rows'])
+
+                savepoint = transaction.savepoint()
+                with connection.cursor() as cursor:
+                    for index in INDEXES:
+                        cursor.execute(f'DROP INDEX "{index}"')
+                self.stdout.write(self.style.MIGRATE_HEADING('Without the indexes'))
+                self._explain(options['rows'], options['repeat'])
+                transaction.savepoint_rollback(savepoint)
+
+                self.stdout.write(self.style.MIGRATE_HEADING('With the indexes'))
+                self._explain(options['rows'], options['repeat'])
+
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _explain(self, rows, repeat):
+        username = f'benchmark.user.{rows // 2}'
+        email = f'{username}@DOMAIN.COM'
+        queries = (
+            ('Looking up a user by username', User.objects.filter(username__iexact=username)),
+            ('Looking up a user by email', User.objects.filter(email__iexact=email)),
+            ('Looking up a user by either username or email',
+             User.objects.filter(Q(username__iexact=username) | Q(email__iexact=username))),
+        )
+        for title, queryset in queries:
+            self.stdout.write(self.style.SQL_KEYWORD(title))
+            self.stdout.write(queryset.explain())
+
+            start = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'{elapsed / repeat * 1000:.2f} ms per lookup')
+            self.stdout.write('')
+
+    @staticmethod
+    def _populate(rows):
+        """Creates the fake users. """
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO auth_user (username, email, password, first_name, last_name, "
+                "                       is_superuser, is_staff, is_active, date_joined) "
+                "SELECT 'Benchmark.User.' || n, 'Benchmark.User.' || n || '@domain.com', "
+                "       '!', '', '', false, false, true, now() "
+                "FROM generate_series(1, %s) AS n",
+                [rows],
+            )
+            cursor.execute('ANALYZE auth_user')
@@ -0,0 +1,25 @@
+"""Management command deleting the revocations of the expired tokens. """
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from users.models import RevokedToken
+
+
+class Command(BaseCommand):
+    """Deletes the revocations of the expired tokens chunk by chunk. The command is supposed to
+    be run periodically (by cron, for example). The expired tokens are rejected anyway, so
+    their revocations only take up space in the table and in the Bloom filters.
+    """
+
+    help = 'Deletes the revocations of the expired tokens.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int,
+                            default=settings.TOKEN_REVOCATION_PURGE_BATCH_SIZE,
+                            help='Number of revocations deleted at once.')
+
+    def handle(self, *args, **options):
+        deleted = RevokedToken.objects.delete_expired(options['batch_size'])
+
+        self.stdout.write(f'Deleted {deleted} revocations of expired tokens.')
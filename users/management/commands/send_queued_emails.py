@@ -0,0 +1,56 @@
+"""Management command sending the queued emails. """
+
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.management.base import BaseCommand
+
+from users.email_backend import metrics
+from users.models import OutgoingEmail
+
+
+class Command(BaseCommand):
+    """Sends the queued emails batch by batch over one connection to the mail server. The
+    connection is closed while the queue is empty. Any number of workers can be run at the same
+    time since every one of them claims its own emails.
+
+    After every batch the command reports the metrics of the emails sent so far (see
+    users.email_backend.metrics; only PooledEmailBackend collects them).
+    """
+
+    help = 'Sends the queued emails.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.EMAIL_QUEUE_BATCH_SIZE,
+                            help='Number of emails claimed at once.')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when there are no emails to send instead of waiting '
+                                 'for new ones.')
+
+    def handle(self, *args, **options):
+        connection = get_connection()
+        try:
+            while True:
+                processed = OutgoingEmail.objects.send_pending(options['batch_size'], connection)
+                if processed:
+                    self._report(processed)
+                    continue
+
+                connection.close()
+                if options['once']:
+                    break
+
+                time.sleep(settings.EMAIL_QUEUE_POLL_INTERVAL)
+        finally:
+            connection.close()
+
+    def _report(self, processed):
+        snapshot = metrics.snapshot()
+        self.stdout.write(
+            f'Processed {processed} emails. Total: {snapshot["sent"]} sent, '
+            f'{snapshot["failed"]} failed, {snapshot["connections_opened"]} connections opened, '
+            f'{snapshot["connections_reused"]} reused, {snapshot["reconnects"]} reconnects, '
+            f'latency {snapshot["avg_latency"] * 1000:.1f} ms on average, '
+            f'{snapshot["max_latency"] * 1000:.1f} ms at most.'
+        )
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-18 07:12
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY can't be run in a transaction, but it doesn't block signing up
+    # while the indexes are being built.
+    atomic = False
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('users', '0004_email_confirmation_token_created_at_index'),
+    ]
+
+    # The expressions must match the SQL generated for the username__iexact and email__iexact
+    # lookups, i.e. UPPER("auth_user"."username"::text) = UPPER(%s).
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS auth_user_username_upper_idx '
+            'ON auth_user (UPPER(username::text))',
+            'DROP INDEX CONCURRENTLY IF EXISTS auth_user_username_upper_idx',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX CONCURRENTLY IF NOT EXISTS auth_user_email_upper_idx '
+            'ON auth_user (UPPER(email::text))',
+            'DROP INDEX CONCURRENTLY IF EXISTS auth_user_email_upper_idx',
+        ),
+    ]
@@ -7,8 +7,13 @@ from datetime import timedelta
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.postgres.fields import JSONField
-from django.db import models
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import connection, models, transaction
+from django.db.models import F
 from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from users.authentication import user_cache
 
 
 class Person(models.Model):
@@ -22,12 +27,78 @@ class Person(models.Model):
         return f'{self.user}'
 
 
+class EmailConfirmationTokenManager(models.Manager):
+    """Manager of the email confirmation tokens. """
+
+    @staticmethod
+    def get_expiry_time():
+        """Returns the time the tokens created before (or at) have expired. """
+
+        return timezone.now() - timedelta(minutes=settings.EMAIL_CONFIRMATION_TOKEN_TTL)
+
+    def unexpired(self):
+        """Returns the tokens which haven't expired yet. """
+
+        return self.filter(created_at__gt=self.get_expiry_time())
+
+    def expired(self):
+        """Returns the tokens which have expired. """
+
+        return self.filter(created_at__lte=self.get_expiry_time())
+
+    def confirm(self, token):
+        """Confirms the email of the person the specified token was created for if the token
+        exists and hasn't expired. The token is consumed. Everything is done by one statement.
+        Returns True if the email has been confirmed.
+        """
+
+        token_table = self.model._meta.db_table
+        person_table = Person._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'WITH token AS ('
+                f'    DELETE FROM {token_table} WHERE token = %s AND created_at > %s '
+                f'    RETURNING person_id'
+                f') '
+                f'UPDATE {person_table} SET email_confirmed = true '
+                f'WHERE id IN (SELECT person_id FROM token) '
+                f'RETURNING user_id',
+                [token, self.get_expiry_time()],
+            )
+            row = cursor.fetchone()
+
+        if row is None:
+            return False
+
+        # The person is changed bypassing the signals.
+        user_cache.invalidate(row[0])
+        return True
+
+    def delete_expired(self, batch_size):
+        """Deletes the expired tokens in chunks of up to 'batch_size' tokens, so that neither
+        a long running query nor a lot of locked rows get in the way of signing up and confirming
+        emails. Returns the number of the deleted tokens.
+        """
+
+        deleted = 0
+        while True:
+            with transaction.atomic():
+                pks = list(self.expired().order_by('created_at')
+                           .select_for_update(skip_locked=True)
+                           .values_list('pk', flat=True)[:batch_size])
+                if not pks:
+                    return deleted
+
+                deleted += self.filter(pk__in=pks).delete()[0]
+
+
 class EmailConfirmationToken(models.Model):
     """The token for email confirmation. """
 
     person = models.OneToOneField(Person, models.CASCADE)
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     token = models.CharField(db_index=True, unique=True, max_length=8)
+    objects = EmailConfirmationTokenManager()
 
     def save(self, force_insert=False, force_update=False, using=None,
              update_fields=None):
@@ -41,9 +112,200 @@ class EmailConfirmationToken(models.Model):
         return f'{self.token}'
 
 
-def clear_expired_email_confirmation_tokens():
-    """Removes all expired email confirmation tokens. """
+class OutgoingEmailManager(models.Manager):
+    """Manager of the outgoing emails queue. """
+
+    def enqueue(self, subject, body, html_body, recipient):
+        """Puts an email to the specified recipient into the queue. The email is sent by the
+        send_queued_emails management command.
+        """
+
+        return self.create(subject=subject, body=body, html_body=html_body,
+                           from_email=settings.DEFAULT_FROM_EMAIL, recipient=recipient)
+
+    def send_pending(self, batch_size, email_connection=None):
+        """Sends up to 'batch_size' emails which are due, skipping the ones being sent by the
+        other workers at the same time. All the emails are sent over one connection, which is
+        left open so that it can be reused by the next batch. The emails which can't be sent
+        are retried later (see OutgoingEmail.defer). Returns the number of the processed
+        emails.
+
+        The emails are claimed by a short transaction, which leases them for
+        EMAIL_QUEUE_LEASE seconds (the other workers skip them until the lease expires, and if
+        the worker dies, they are sent again afterwards), and sent outside any transaction, so
+        a slow mail server doesn't keep the rows locked.
+        """
+
+        if email_connection is None:
+            email_connection = get_connection()
+
+        with transaction.atomic():
+            now = timezone.now()
+            emails = list(
+                self.select_for_update(skip_locked=True)
+                .filter(status=OutgoingEmail.PENDING, next_attempt_at__lte=now)
+                .order_by('next_attempt_at', 'pk')[:batch_size]
+            )
+            if not emails:
+                return 0
+
+            lease_expires_at = now + timedelta(seconds=settings.EMAIL_QUEUE_LEASE)
+            self.filter(pk__in=[email.pk for email in emails]).update(
+                next_attempt_at=lease_expires_at,
+            )
+
+        sent, failed = [], []
+        for email in emails:
+            try:
+                email_connection.open()
+                email_connection.send_messages([email.to_message()])
+            except Exception as exc:  # pylint: disable=broad-except
+                failed.append((email, exc))
+                # The connection may be broken, so start over with the next email.
+                email_connection.close()
+            else:
+                sent.append(email.pk)
+
+        with transaction.atomic():
+            self.filter(pk__in=sent).update(status=OutgoingEmail.SENT, sent_at=timezone.now(),
+                                            attempts=F('attempts') + 1, last_error='')
+            for email, exc in failed:
+                email.defer(exc)
+
+        return len(emails)
+
+
+class OutgoingEmail(models.Model):
+    """An email waiting to be sent (or already sent). Emails are put into the queue while
+    handling requests and sent in the background (see OutgoingEmailManager.send_pending), so
+    the requests don't have to wait for the mail server.
+    """
 
-    expiry_time = timezone.now() - timedelta(minutes=settings.EMAIL_CONFIRMATION_TOKEN_TTL)
+    PENDING = 'P'
+    SENT = 'S'
+    FAILED = 'F'
 
-    EmailConfirmationToken.objects.filter(created_at__lte=expiry_time).delete()
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    def to_message(self):
+        """Returns the message to be passed to an email backend. """
+
+        msg = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email,
+            bcc=[self.recipient],
+            headers={
+                'From': f'{settings.DEFAULT_SITE_NAME} <{self.from_email}>',
+                'To': self.recipient,
+            }
+        )
+        if self.html_body:
+            msg.attach_alternative(self.html_body, 'text/html')
+
+        return msg
+
+    def defer(self, error):
+        """Schedules the next attempt to send the email, doubling the delay with every failed
+        attempt, or gives up after EMAIL_QUEUE_MAX_ATTEMPTS attempts.
+        """
+
+        self.attempts += 1
+        self.last_error = str(error)
+        if self.attempts >= settings.EMAIL_QUEUE_MAX_ATTEMPTS:
+            self.status = OutgoingEmail.FAILED
+        else:
+            delay = settings.EMAIL_QUEUE_RETRY_DELAY * 2 ** (self.attempts - 1)
+            self.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+
+        self.save(update_fields=['attempts', 'last_error', 'status', 'next_attempt_at'])
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=254)
+    recipient = models.EmailField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    status = models.CharField(max_length=1, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True)
+    objects = OutgoingEmailManager()
+
+    class Meta:
+        indexes = [
+            # Backs OutgoingEmailManager.send_pending. Only the pending emails are indexed
+            # since the sent ones pile up.
+            models.Index(fields=['next_attempt_at', 'id'], name='outgoing_email_queue_idx',
+                         condition=models.Q(status='P')),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} to {self.recipient}'
+
+
+class RevokedTokenManager(models.Manager):
+    """Manager of the revoked tokens. """
+
+    def revoke_token(self, jti, expires_at):
+        """Revokes the token with the specified id, which is valid until 'expires_at'. """
+
+        self.bulk_create([self.model(jti=jti, expires_at=expires_at)], ignore_conflicts=True)
+
+    def revoke_user_tokens(self, user_id):
+        """Revokes all the tokens issued to the specified user so far. Returns the time the
+        tokens issued before (or at) are revoked.
+        """
+
+        revoked_at = timezone.now()
+        self.create(user_id=user_id, revoked_at=revoked_at,
+                    expires_at=revoked_at + api_settings.REFRESH_TOKEN_LIFETIME)
+
+        return revoked_at
+
+    def unexpired(self):
+        """Returns the revocations of the tokens which haven't expired yet. """
+
+        return self.filter(expires_at__gt=timezone.now())
+
+    def delete_expired(self, batch_size):
+        """Deletes the revocations of the expired tokens in chunks of up to 'batch_size' rows,
+        one statement per chunk. Returns the number of the deleted rows.
+        """
+
+        table = self.model._meta.db_table
+        deleted = 0
+        while True:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'DELETE FROM {table} WHERE id IN ('
+                    f'    SELECT id FROM {table} WHERE expires_at <= %s '
+                    f'    LIMIT %s FOR UPDATE SKIP LOCKED'
+                    f')',
+                    [timezone.now(), batch_size],
+                )
+                deleted += cursor.rowcount
+
+            if cursor.rowcount < batch_size:
+                return deleted
+
+
+class RevokedToken(models.Model):
+    """A revoked token or, if the token id is not specified, all the tokens issued to the user
+    before the time of the revocation. The revocations are only kept until the tokens they
+    apply to expire, since the expired tokens are rejected anyway.
+    """
+
+    jti = models.CharField(max_length=255, unique=True, null=True)
+    user_id = models.IntegerField(null=True)
+    revoked_at = models.DateTimeField(default=timezone.now, db_index=True)
+    expires_at = models.DateTimeField(db_index=True)
+    objects = RevokedTokenManager()
+
+    def __str__(self):
+        return self.jti or f'tokens of user {self.user_id} before {self.revoked_at}'
@@ -0,0 +1,20 @@
+"""URL configuration of resetting the password, which mirrors the one of
+django-rest-passwordreset but throttles the requests.
+"""
+
+from django.urls import re_path
+
+from .views import (
+    PasswordResetConfirmView,
+    PasswordResetRequestView,
+    PasswordResetValidateTokenView,
+)
+
+app_name = 'password_reset'  # pylint: disable=invalid-name
+
+urlpatterns = [  # pylint: disable=invalid-name
+    re_path('^validate_token/', PasswordResetValidateTokenView.as_view(),
+            name='reset-password-validate'),
+    re_path('^confirm/', PasswordResetConfirmView.as_view(), name='reset-password-confirm'),
+    re_path('^$', PasswordResetRequestView.as_view(), name='reset-password-request'),
+]
@@ -0,0 +1,206 @@
+"""Module containing the store of the revoked tokens. """
+
+import hashlib
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from users.models import RevokedToken
+
+# How far back the revocations are re-read when the store is refreshed, so that the ones
+# committed by the other processes a bit later than they were made aren't missed.
+REFRESH_OVERLAP = timedelta(minutes=1)
+
+
+class BloomFilter:
+    """Bloom filter of the strings. It answers whether a string has been added to it using
+    a fixed amount of memory and a fixed number of hashes, but may give a false positive with
+    the specified probability if there are up to 'capacity' strings in it.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.count = 0
+        self._size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self._hashes = max(1, round(self._size / capacity * math.log(2)))
+        self._bits = bytearray((self._size + 7) // 8)
+
+    def _get_positions(self, item):
+        # Double hashing (Kirsch and Mitzenmacher) derives all the hashes from one digest.
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'big'), int.from_bytes(digest[8:], 'big')
+        return [(first + i * second) % self._size for i in range(self._hashes)]
+
+    def add(self, item):
+        """Adds the string to the filter. """
+
+        for position in self._get_positions(item):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self._bits[position >> 3] & (1 << (position & 7))
+                   for position in self._get_positions(item))
+
+
+class TokenRevocationStore:
+    """Per-process view of the revoked tokens (see RevokedToken), so that checking whether a
+    token is revoked doesn't query the database.
+
+    The ids of the revoked tokens are kept in a Bloom filter, and only the tokens it reports
+    as revoked (which are either revoked indeed or false positives) are looked up in the
+    database. The times before which all the tokens of a user are revoked are kept in a dict.
+
+    Every TOKEN_REVOCATION_REFRESH_INTERVAL seconds the revocations made by the other
+    processes are read incrementally. Every TOKEN_REVOCATION_REBUILD_INTERVAL seconds (or
+    when the filter is full) the store is rebuilt from scratch to get rid of the revocations
+    of the expired tokens, and the new filter is sized for twice as many tokens as are revoked
+    (but not less than TOKEN_REVOCATION_BLOOM_CAPACITY), so it doesn't fill up again soon.
+
+    The store is refreshed by one request at a time, which queries the database without
+    holding the lock and then swaps the new state in. The other requests meanwhile keep using
+    the current state (or query the database until the store is built for the first time).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Makes the store rebuild itself on the next check. """
+
+        with self._lock:
+            self._bloom = None
+            self._cutoffs = {}
+            self._refreshed_at = None
+            self._checked_at = 0.0
+            self._rebuilt_at = 0.0
+            # The revocations made by the current process while the store is being refreshed,
+            # which are applied to the refreshed state since it may have missed them.
+            self._pending = None
+
+    @staticmethod
+    def _load(since=None):
+        """Returns the ids of the tokens and the ids of the users (along with the times they
+        are revoked at) of the unexpired revocations made since the specified time (all of them
+        if it's None), and the time they are read at.
+        """
+
+        refreshed_at = timezone.now()
+        revocations = RevokedToken.objects.unexpired()
+        if since is not None:
+            revocations = revocations.filter(revoked_at__gte=since - REFRESH_OVERLAP)
+
+        jtis, users = [], []
+        for jti, user_id, revoked_at in revocations.values_list('jti', 'user_id', 'revoked_at'):
+            if jti is None:
+                users.append((user_id, revoked_at.timestamp()))
+            else:
+                jtis.append(jti)
+
+        return jtis, users, refreshed_at
+
+    @staticmethod
+    def _apply(bloom, cutoffs, jtis, users):
+        for jti in jtis:
+            if jti not in bloom:
+                bloom.add(jti)
+
+        for user_id, cutoff in users:
+            if cutoff > cutoffs.get(user_id, 0.0):
+                cutoffs[user_id] = cutoff
+
+    def _ensure_fresh(self):
+        current_time = time.monotonic()
+        with self._lock:
+            if self._pending is not None:
+                return  # another request is refreshing the store
+
+            rebuild = (self._bloom is None or self._bloom.count > self._bloom.capacity
+                       or current_time - self._rebuilt_at
+                       >= settings.TOKEN_REVOCATION_REBUILD_INTERVAL)
+            if not rebuild and (current_time - self._checked_at
+                                < settings.TOKEN_REVOCATION_REFRESH_INTERVAL):
+                return
+
+            self._pending = ([], [])
+            since = None if rebuild else self._refreshed_at
+
+        try:
+            jtis, users, refreshed_at = self._load(since)
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+
+        if rebuild:
+            capacity = max(settings.TOKEN_REVOCATION_BLOOM_CAPACITY, 2 * len(jtis))
+            bloom = BloomFilter(capacity, settings.TOKEN_REVOCATION_BLOOM_ERROR_RATE)
+            cutoffs = {}
+            self._apply(bloom, cutoffs, jtis, users)
+
+        with self._lock:
+            if rebuild:
+                self._bloom, self._cutoffs = bloom, cutoffs
+                self._rebuilt_at = current_time
+            else:
+                self._apply(self._bloom, self._cutoffs, jtis, users)
+
+            self._apply(self._bloom, self._cutoffs, *self._pending)
+            self._pending = None
+            self._refreshed_at = refreshed_at
+            self._checked_at = current_time
+
+    def is_revoked(self, jti, user_id, issued_at):
+        """Returns whether the token with the specified id, issued to the specified user at the
+        specified time (seconds since the epoch), is revoked.
+        """
+
+        self._ensure_fresh()
+        with self._lock:
+            built = self._bloom is not None
+            cutoff = self._cutoffs.get(user_id)
+            if cutoff is not None and issued_at <= cutoff:
+                return True
+
+            maybe_revoked = built and jti in self._bloom
+
+        if not built:
+            # The store is being built by another request.
+            return RevokedToken.objects.unexpired().filter(
+                Q(jti=jti) | Q(user_id=user_id, revoked_at__gte=datetime_from_epoch(issued_at))
+            ).exists()
+
+        return maybe_revoked and RevokedToken.objects.filter(jti=jti).exists()
+
+    def revoke_token(self, jti, exp):
+        """Revokes the token with the specified id, which expires at 'exp' (seconds since the
+        epoch).
+        """
+
+        RevokedToken.objects.revoke_token(jti, datetime_from_epoch(exp))
+        with self._lock:
+            if self._pending is not None:
+                self._pending[0].append(jti)
+            if self._bloom is not None:
+                self._apply(self._bloom, self._cutoffs, [jti], [])
+
+    def revoke_user_tokens(self, user_id):
+        """Revokes all the tokens issued to the specified user so far. """
+
+        revoked_at = RevokedToken.objects.revoke_user_tokens(user_id)
+        users = [(user_id, revoked_at.timestamp())]
+        with self._lock:
+            if self._pending is not None:
+                self._pending[1].extend(users)
+            self._apply(self._bloom, self._cutoffs, [], users)
+
+
+revocation_store = TokenRevocationStore()  # pylint: disable=invalid-name
@@ -1,12 +1,18 @@
 """Module containing serializers for the CusDeb API Users application. """
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
 from rest_framework import serializers
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
 
-from .models import EmailConfirmationToken
+from .authentication import user_cache
+from .tokens import IdentityRefreshToken, set_identity_claims
 
 
 class TokenSerializer(serializers.Serializer):  # pylint: disable=abstract-method
@@ -22,6 +28,57 @@ class CurrentUserSerializer(serializers.ModelSerializer):
         fields = ('username', 'email', )
 
 
+class IdentityTokenObtainPairSerializer(  # pylint: disable=abstract-method
+        TokenObtainPairSerializer):
+    """Serializes the token pair carrying the identity of the user. """
+
+    @classmethod
+    def get_token(cls, user):
+        return IdentityRefreshToken.for_user(user)
+
+
+class IdentityTokenRefreshSerializer(TokenRefreshSerializer):  # pylint: disable=abstract-method
+    """Serializes the access token carrying the identity of the user. The identity is taken
+    from the user rather than the refresh token, since it may have changed since the refresh
+    token was issued. The revoked refresh tokens are rejected, and if the refresh tokens are
+    rotated, the previous one is revoked provided BLACKLIST_AFTER_ROTATION is enabled.
+    """
+
+    def validate(self, attrs):
+        refresh = IdentityRefreshToken(attrs['refresh'])
+
+        access = refresh.access_token
+        if settings.JWT_IDENTITY_CLAIMS:
+            user = user_cache.get(refresh[api_settings.USER_ID_CLAIM])
+            if user is not None:
+                set_identity_claims(access, user)
+
+        data = {'access': str(access)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.revoke()
+
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh['iat'] = refresh.current_time.timestamp()
+
+            data['refresh'] = str(refresh)
+
+        return data
+
+
+class TokenRevokeSerializer(serializers.Serializer):  # pylint: disable=abstract-method
+    """Revokes the refresh token, so that no more access tokens can be issued with it. """
+
+    refresh = serializers.CharField()
+
+    def validate(self, attrs):
+        IdentityRefreshToken(attrs['refresh']).revoke()
+
+        return {}
+
+
 class SocialTokenObtainPairSerializer(serializers.Serializer):  # pylint: disable=abstract-method
     """Serializes the token data for social user. """
     def __init__(self, *args, **kwargs):
@@ -41,7 +98,7 @@ class SocialTokenObtainPairSerializer(serializers.Serializer):  # pylint: disabl
                 ('No active account found with the given credentials'),
             )
 
-        refresh = RefreshToken.for_user(self.user)
+        refresh = IdentityRefreshToken.for_user(self.user)
 
         data['refresh'] = str(refresh)
         data['access'] = str(refresh.access_token)  #pylint: disable=no-member
@@ -152,11 +209,3 @@ class ConfirmEmailSerializer(serializers.Serializer):  # pylint: disable=abstrac
     """Serializes the email confirmation token. """
 
     token = serializers.CharField(max_length=8, min_length=8)
-
-    def validate_token(self, value):  # pylint: disable=no-self-use
-        """Validates the email confirmation token. """
-
-        if not EmailConfirmationToken.objects.filter(token=value).exists():
-            raise serializers.ValidationError("Token doesn't exist.")
-
-        return value
@@ -2,22 +2,23 @@
 
 from urllib.parse import urljoin
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
 
 from django_rest_passwordreset.models import get_password_reset_token_expiry_time
-from django_rest_passwordreset.signals import reset_password_token_created
-from users.models import EmailConfirmationToken, Person
+from django_rest_passwordreset.signals import post_password_reset, reset_password_token_created
+from users.authentication import user_cache
+from users.emails import render_email
+from users.models import EmailConfirmationToken, OutgoingEmail, Person
+from users.revocation import revocation_store
 
 
 @receiver(post_save, sender=User)
 def create_person(sender,  # pylint: disable=unused-argument
                   instance, created, **_kwargs):
-    """Creates a Person instance and sends an email to the user, letting them to confirm
+    """Creates a Person instance and queues an email to the user, letting them to confirm
     their email address. """
 
     if created:
@@ -36,22 +37,58 @@ def create_person(sender,  # pylint: disable=unused-argument
         }
 
         # render email text
-        email_html_message = render_to_string('email/confirm_email.html', context)
-        email_plaintext_message = render_to_string('email/confirm_email.txt', context)
+        email_plaintext_message, email_html_message = render_email('confirm_email', context)
 
-        msg = EmailMultiAlternatives(
+        OutgoingEmail.objects.enqueue(
             subject=f'Confirm email for {settings.DEFAULT_SITE_NAME}',
             body=email_plaintext_message,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            bcc=[instance.email],
-            headers={
-                'From': f'{settings.DEFAULT_SITE_NAME} <{settings.DEFAULT_FROM_EMAIL}>',
-                'To': instance.email,
-            }
+            html_body=email_html_message,
+            recipient=instance.email,
         )
 
-        msg.attach_alternative(email_html_message, 'text/html')
-        msg.send()
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender,  # pylint: disable=unused-argument
+                           instance, **_kwargs):
+    """Drops the user from the cache of the authenticated users when it's changed. """
+
+    user_cache.invalidate(instance.pk)
+
+
+@receiver(pre_save, sender=User)
+def revoke_tokens_of_deactivated_user(sender,  # pylint: disable=unused-argument
+                                      instance, update_fields=None, **_kwargs):
+    """Revokes all the tokens issued to the user when they are deactivated, since the
+    identity-only endpoints (see IdentityTokenAuthentication) trust the tokens without looking
+    the user up.
+    """
+
+    if (instance.pk is None or instance.is_active
+            or (update_fields is not None and 'is_active' not in update_fields)):
+        return
+
+    if User.objects.filter(pk=instance.pk, is_active=True).exists():
+        revocation_store.revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def revoke_tokens_of_deleted_user(sender,  # pylint: disable=unused-argument
+                                  instance, **_kwargs):
+    """Revokes all the tokens issued to the user when they are deleted (either by the user
+    themselves or in any other way), since the identity-only endpoints don't look the user up.
+    """
+
+    revocation_store.revoke_user_tokens(instance.pk)
+
+
+@receiver(post_save, sender=Person)
+@receiver(post_delete, sender=Person)
+def invalidate_cached_person(sender,  # pylint: disable=unused-argument
+                             instance, **_kwargs):
+    """Drops the user from the cache of the authenticated users when their person is changed. """
+
+    user_cache.invalidate(instance.user_id)
 
 
 @receiver(reset_password_token_created)
@@ -60,7 +97,7 @@ def password_reset_token_created(
         reset_password_token, *_args, **_kwargs
 ):
     """Handles password reset tokens.
-    When a token is created, an e-mail needs to be sent to the user.
+    When a token is created, an e-mail needs to be sent to the user, so it's queued.
     """
 
     reset_password_base_url = urljoin(settings.BASE_SITE_URL, '/reset-password/confirm/')
@@ -73,18 +110,19 @@ def password_reset_token_created(
         'site_name': settings.DEFAULT_SITE_NAME,
         'token_expiry_time': get_password_reset_token_expiry_time(),
     }
-    email_html_message = render_to_string('email/user_reset_password.html', context)
-    email_plaintext_message = render_to_string('email/user_reset_password.txt', context)
+    email_plaintext_message, email_html_message = render_email('user_reset_password', context)
 
-    msg = EmailMultiAlternatives(
+    OutgoingEmail.objects.enqueue(
         subject=f'Password reset for {settings.DEFAULT_SITE_NAME}',
         body=email_plaintext_message,
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        bcc=[reset_password_token.user.email],
-        headers={
-            'From': f'{settings.DEFAULT_SITE_NAME} <{settings.DEFAULT_FROM_EMAIL}>',
-            'To': reset_password_token.user.email,
-        }
+        html_body=email_html_message,
+        recipient=reset_password_token.user.email,
     )
-    msg.attach_alternative(email_html_message, 'text/html')
-    msg.send()
+
+
+@receiver(post_password_reset)
+def revoke_tokens_after_password_reset(sender,  # pylint: disable=unused-argument
+                                       user, *_args, **_kwargs):
+    """Revokes all the tokens issued to the user before their password was reset. """
+
+    revocation_store.revoke_user_tokens(user.id)
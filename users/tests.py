@@ -1,15 +1,43 @@
 """Tests for the CusDeb API Users application. """
 
+# pylint: disable=too-many-lines
+
 import json
+import os
+import tempfile
 from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPServerDisconnected
+from unittest import mock
 
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
 from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.hashers import pbkdf2
 from django.contrib.auth.models import User
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.mail import get_connection, send_mail
+from django.core.management import call_command
 from django.urls import reverse
 from django.utils import timezone
+from django_rest_passwordreset.signals import post_password_reset
 from rest_framework.exceptions import ErrorDetail
+from rest_framework.test import APIRequestFactory
 from rest_framework.views import status
-
+from rest_framework_simplejwt import state
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, TokenBackendError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from users.authentication import CachedJWTAuthentication, user_cache
+from users.email_backend import close_pooled_connections, metrics
+from users.emails import render_email
+from users.models import EmailConfirmationToken, OutgoingEmail, RevokedToken
+from users.revocation import BloomFilter, TokenRevocationStore, revocation_store
+from users.throttling import check_rates, take_token
+from users.token_backend import KeySetTokenBackend, install_token_backend
 from util.base_test import BaseSingleUserTest
 
 
@@ -113,6 +141,52 @@ class AuthSigningUpAndSigningInUserTest(BaseSingleUserTest):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_signing_in_user_case_insensitively(self):
+        url = reverse('token-obtain-pair', kwargs={'version': 'v1'})
+        for username in (self._user['username'].upper(), self._user['email'].upper()):
+            user = {'username': username, 'password': self._user['password']}
+            response = self.client.post(url, data=json.dumps(user),
+                                        content_type='application/json')
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_authenticating_with_one_query_and_one_hash(self):
+        for username in (self._user['username'], self._user['email'], 'non.existent.user'):
+            with mock.patch('django.contrib.auth.hashers.pbkdf2', wraps=pbkdf2) as hasher:
+                with self.assertNumQueries(1):
+                    authenticate(username=username, password=self._user['password'])
+
+            self.assertEqual(hasher.call_count, 1)
+
+    def test_authenticating_user_whose_email_is_username_of_another_one(self):
+        another_user = User.objects.create_user(username=self._user['email'], password='another',
+                                                email='another.user@domain.com')
+        another_user.person.email_confirmed = True
+        another_user.person.save(update_fields=['email_confirmed'])
+
+        user = authenticate(username=self._user['email'], password=self._user['password'])
+        self.assertEqual(user.username, self._user['username'])
+
+        user = authenticate(username=self._user['email'], password='another')
+        self.assertEqual(user, another_user)
+
+    def test_rehashing_password_on_signing_in(self):
+        with self.settings(PASSWORD_HASHER_PBKDF2_ITERATIONS=1000):
+            user = authenticate(username=self._user['username'], password=self._user['password'])
+
+            self.assertTrue(user.password.startswith('pbkdf2_sha256$1000$'))
+            self.assertEqual(User.objects.get(pk=user.pk).password, user.password)
+            self.assertIsNotNone(authenticate(username=self._user['username'],
+                                              password=self._user['password']))
+
+    def test_authenticating_user_with_unconfirmed_email(self):
+        user = User.objects.get(username=self._user['username'])
+        user.person.email_confirmed = False
+        user.person.save(update_fields=['email_confirmed'])
+
+        self.assertIsNone(authenticate(username=self._user['username'],
+                                       password=self._user['password']))
+
     def test_handling_non_existent_account(self):
         user = self._user.copy()
         user['username'] = 'non.existent.user'
@@ -153,6 +227,76 @@ class WhoAmIUserTest(BaseSingleUserTest):
 
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def _whoami(self, access):
+        url = reverse('who-am-i', kwargs={'version': 'v1'})
+        return self.client.get(url, HTTP_AUTHORIZATION=b'Bearer ' + access.encode())
+
+    def _obtain_tokens(self):
+        url = reverse('token-obtain-pair', kwargs={'version': 'v1'})
+        return self.client.post(url, data=json.dumps(self._user),
+                                content_type='application/json').json()
+
+    def test_whoami_from_token_claims(self):
+        access = self._obtain_tokens()['access']
+        # Let the store of the revoked tokens load.
+        self._whoami(access)
+
+        with self.assertNumQueries(0):
+            response = self._whoami(access)
+
+        self.assertEqual(response.json(), {
+            'username': self._user['username'],
+            'email': self._user['email'],
+        })
+        self.assertTrue(AccessToken(access)['email_confirmed'])
+
+    def test_whoami_without_token_claims(self):
+        with self.settings(JWT_IDENTITY_CLAIMS=False):
+            access = self._obtain_tokens()['access']
+            self.assertNotIn('username', AccessToken(access))
+
+            response = self._whoami(access)
+
+        self.assertEqual(response.json(), {
+            'username': self._user['username'],
+            'email': self._user['email'],
+        })
+
+    def test_whoami_of_deactivated_user(self):
+        access = self._obtain_tokens()['access']
+
+        user = User.objects.get(username=self._user['username'])
+        user.is_active = False
+        user.save()
+
+        self.assertEqual(self._whoami(access).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_whoami_of_deactivated_user_without_token_claims(self):
+        with self.settings(JWT_IDENTITY_CLAIMS=False):
+            access = self._obtain_tokens()['access']
+
+        User.objects.filter(username=self._user['username']).update(is_active=False)
+        user_cache.clear()
+
+        self.assertEqual(self._whoami(access).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_whoami_after_login_update(self):
+        tokens = self._obtain_tokens()
+
+        data = {'username': 'new_username', 'email': 'new_email@cusdeb.com'}
+        url = reverse('user-login-update', kwargs={'version': 'v1'})
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json',
+                                    HTTP_AUTHORIZATION=b'Bearer ' + tokens['access'].encode())
+
+        # The tokens given by the login update carry the new identity.
+        self.assertEqual(self._whoami(response.json()['access']).json(), data)
+
+        # So do the access tokens issued by the refresh tokens obtained before.
+        url = reverse('token-refresh', kwargs={'version': 'v1'})
+        response = self.client.post(url, data=json.dumps({'refresh': tokens['refresh']}),
+                                    content_type='application/json')
+        self.assertEqual(self._whoami(response.json()['access']).json(), data)
+
 
 class PasswordUpdateTest(BaseSingleUserTest):
     """Tests the password_update endpoint. """
@@ -471,10 +615,14 @@ class UserConfirmEmailTest(BaseSingleUserTest):
 
         url = reverse('confirm-email', kwargs={'version': 'v1'})
         data = {'token': email_confirmation_token}
-        response = self.client.post(url, data=json.dumps(data),
-                                    content_type='application/json')
+        with self.assertNumQueries(1):
+            response = self.client.post(url, data=json.dumps(data),
+                                        content_type='application/json')
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(User.objects.get(username=self._user['username']).person.email_confirmed)
+        self.assertFalse(EmailConfirmationToken.objects.filter(
+            token=email_confirmation_token).exists())
 
     def test_confirm_email_with_invalid_token(self):
         """Tests if it's not possible to confirm the user email with invalid token. """
@@ -519,3 +667,760 @@ class UserConfirmEmailTest(BaseSingleUserTest):
 
         self.assertEqual(response.content, b'{"token": ["Token doesn\'t exist."]}')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_clearing_expired_tokens(self):
+        """Tests if the expired tokens are deleted chunk by chunk and the other ones are kept. """
+
+        for i in range(5):
+            User.objects.create_user(username=f'user{i}', password='secret',
+                                     email=f'user{i}@domain.com')
+        EmailConfirmationToken.objects.exclude(person__user__username='user0').update(
+            created_at=timezone.now() - timedelta(minutes=settings.EMAIL_CONFIRMATION_TOKEN_TTL)
+        )
+
+        call_command('clear_expired_email_confirmation_tokens', '--batch-size=2',
+                     stdout=StringIO())
+
+        self.assertEqual(
+            list(EmailConfirmationToken.objects.values_list('person__user__username', flat=True)),
+            ['user0'],
+        )
+
+
+class OutgoingEmailTest(BaseSingleUserTest):
+    """Tests queueing and sending emails. """
+
+    def setUp(self):
+        super().setUp()
+
+        # Forget about the email to the user created by the base class.
+        OutgoingEmail.objects.all().delete()
+
+    def test_signing_up_queues_email(self):
+        url = reverse('sign-up', kwargs={'version': 'v1'})
+        user = {
+            'username': 'some.username',
+            'password': 'secret',
+            'email': 'some.username@domain.com',
+        }
+
+        response = self.client.post(url, data=json.dumps(user),
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(mail.outbox), 0)
+
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.recipient, 'some.username@domain.com')
+        self.assertEqual(email.status, OutgoingEmail.PENDING)
+
+        call_command('send_queued_emails', '--once', stdout=StringIO())
+
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].bcc, ['some.username@domain.com'])
+        self.assertEqual(mail.outbox[0].subject, f'Confirm email for {settings.DEFAULT_SITE_NAME}')
+        self.assertEqual(mail.outbox[0].alternatives[0][1], 'text/html')
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.SENT)
+
+    def test_rendering_emails(self):
+        context = {
+            'username': 'some.username',
+            'confirm_email_url': 'https://cusdeb.com/confirm-email/?token=01234567',
+            'site_name': 'CusDeb',
+        }
+
+        txt, html = render_email('confirm_email', context)
+
+        self.assertIn('https://cusdeb.com/confirm-email/?token=01234567', txt)
+        self.assertIn('https://cusdeb.com/confirm-email/?token=01234567', html)
+        self.assertNotEqual(txt, html)
+
+    def test_resetting_password_queues_email(self):
+        url = reverse('password_reset:reset-password-request', kwargs={'version': 'v1'})
+
+        response = self.client.post(url, data=json.dumps({'email': self._user['email']}),
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutgoingEmail.objects.get().recipient, self._user['email'])
+
+    def test_resetting_password_at_unknown_path(self):
+        url = reverse('password_reset:reset-password-request', kwargs={'version': 'v1'})
+
+        response = self.client.post(f'{url}unknown/',
+                                    data=json.dumps({'email': self._user['email']}),
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertFalse(OutgoingEmail.objects.filter(subject__startswith='Password').exists())
+
+    def test_sending_emails_in_batches(self):
+        for i in range(5):
+            OutgoingEmail.objects.enqueue('Subject', 'Body', '', f'user{i}@domain.com')
+
+        self.assertEqual(OutgoingEmail.objects.send_pending(batch_size=3), 3)
+        self.assertEqual(OutgoingEmail.objects.send_pending(batch_size=3), 2)
+        self.assertEqual(OutgoingEmail.objects.send_pending(batch_size=3), 0)
+        self.assertEqual(len(mail.outbox), 5)
+
+    def test_retrying_emails(self):
+        OutgoingEmail.objects.enqueue('Subject', 'Body', '', 'user@domain.com')
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=SMTPServerDisconnected('Connection unexpectedly closed')):
+            OutgoingEmail.objects.send_pending(batch_size=10)
+
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.status, OutgoingEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.last_error, 'Connection unexpectedly closed')
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        # The email isn't retried until the delay expires.
+        self.assertEqual(OutgoingEmail.objects.send_pending(batch_size=10), 0)
+
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        OutgoingEmail.objects.send_pending(batch_size=10)
+
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.status, OutgoingEmail.SENT)
+        self.assertEqual(email.attempts, 2)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_leasing_emails_while_sending(self):
+        OutgoingEmail.objects.enqueue('Subject', 'Body', '', 'user@domain.com')
+        due = []
+
+        def send_messages(_messages):
+            # Another worker finds nothing to claim while the email is being sent.
+            due.append(OutgoingEmail.objects.filter(next_attempt_at__lte=timezone.now()).count())
+            return 1
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=send_messages):
+            self.assertEqual(OutgoingEmail.objects.send_pending(batch_size=10), 1)
+
+        self.assertEqual(due, [0])
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.SENT)
+
+    def test_giving_up_on_emails(self):
+        OutgoingEmail.objects.enqueue('Subject', 'Body', '', 'user@domain.com')
+
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages',
+                        side_effect=SMTPServerDisconnected('Connection unexpectedly closed')):
+            for _ in range(settings.EMAIL_QUEUE_MAX_ATTEMPTS):
+                OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+                OutgoingEmail.objects.send_pending(batch_size=10)
+
+        email = OutgoingEmail.objects.get()
+        self.assertEqual(email.status, OutgoingEmail.FAILED)
+        self.assertEqual(email.attempts, settings.EMAIL_QUEUE_MAX_ATTEMPTS)
+
+
+@mock.patch('smtplib.SMTP')
+class PooledEmailBackendTest(BaseSingleUserTest):
+    """Tests the email backend reusing the connections to the mail server. """
+
+    def setUp(self):
+        super().setUp()
+
+        close_pooled_connections()
+        metrics.reset()
+
+    def tearDown(self):
+        close_pooled_connections()
+
+        super().tearDown()
+
+    @staticmethod
+    def _send_mail():
+        connection = get_connection('users.email_backend.PooledEmailBackend')
+        return send_mail('Subject', 'Body', 'info@cusdeb.com', ['user@domain.com'],
+                         connection=connection)
+
+    def test_reusing_connections(self, smtp):
+        for _ in range(3):
+            self.assertEqual(self._send_mail(), 1)
+
+        self.assertEqual(smtp.call_count, 1)
+        self.assertEqual(smtp.return_value.sendmail.call_count, 3)
+        smtp.return_value.quit.assert_not_called()
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['sent'], 3)
+        self.assertEqual(snapshot['connections_opened'], 1)
+        self.assertEqual(snapshot['connections_reused'], 2)
+
+    def test_not_reusing_stale_connections(self, smtp):
+        self._send_mail()
+        with self.settings(EMAIL_POOL_MAX_IDLE=0):
+            self._send_mail()
+
+        self.assertEqual(smtp.call_count, 2)
+        smtp.return_value.quit.assert_called_once()
+
+    def test_reconnecting(self, smtp):
+        self._send_mail()
+        smtp.return_value.sendmail.side_effect = [
+            SMTPServerDisconnected('Connection unexpectedly closed'),
+            {},
+        ]
+
+        self.assertEqual(self._send_mail(), 1)
+        self.assertEqual(smtp.call_count, 2)
+        self.assertEqual(metrics.snapshot()['reconnects'], 1)
+
+    def test_failing(self, smtp):
+        smtp.return_value.sendmail.side_effect = SMTPServerDisconnected('Connection refused')
+
+        with self.assertRaises(SMTPServerDisconnected):
+            self._send_mail()
+
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['sent'], 0)
+        self.assertEqual(snapshot['failed'], 1)
+
+    def test_dropping_failed_connections(self, smtp):
+        smtp.return_value.sendmail.side_effect = [
+            SMTPServerDisconnected('Connection unexpectedly closed'),
+            SMTPServerDisconnected('Connection unexpectedly closed'),
+            {},
+        ]
+
+        with self.assertRaises(SMTPServerDisconnected):
+            self._send_mail()
+
+        self.assertEqual(self._send_mail(), 1)
+        self.assertEqual(smtp.call_count, 3)
+
+    def test_reporting_metrics(self, _smtp):
+        OutgoingEmail.objects.all().delete()
+        OutgoingEmail.objects.enqueue('Subject', 'Body', '<p>Body</p>', 'user@domain.com')
+        output = StringIO()
+
+        with self.settings(EMAIL_BACKEND='users.email_backend.PooledEmailBackend'):
+            call_command('send_queued_emails', '--once', stdout=output)
+
+        self.assertIn('Processed 1 emails. Total: 1 sent, 0 failed, 1 connections opened, '
+                      '0 reused, 0 reconnects', output.getvalue())
+
+
+class CachedAuthenticationTest(BaseSingleUserTest):
+    """Tests authenticating the requests on behalf of the cached users. """
+
+    def setUp(self):
+        super().setUp()
+
+        user_cache.clear()
+        self._auth_header = self._get_auth_header()
+
+    def _authenticate(self):
+        """Authenticates a request the way the endpoints do and returns the user. """
+
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=self._auth_header)
+        return CachedJWTAuthentication().authenticate(request)[0]
+
+    def test_authenticating_without_queries(self):
+        self._authenticate()
+
+        with self.assertNumQueries(0):
+            user = self._authenticate()
+            self.assertTrue(user.person.email_confirmed)
+
+        self.assertEqual(user.username, self._user['username'])
+
+    def test_seeing_changes_of_user(self):
+        self._authenticate()
+
+        user = User.objects.get(username=self._user['username'])
+        user.email = 'new.email@domain.com'
+        user.save(update_fields=['email'])
+
+        self.assertEqual(self._authenticate().email, 'new.email@domain.com')
+
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+
+    def test_not_writing_back_cached_user(self):
+        self._authenticate()
+        # Another process changes the user, so the cached copy is outdated.
+        User.objects.filter(username=self._user['username']).update(email='new@domain.com')
+
+        password = 'SuperSecret'
+        url = reverse('password-update', kwargs={'version': 'v1'})
+        data = {'old_password': self._user['password'], 'password': password,
+                'retype_password': password}
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json',
+                                    HTTP_AUTHORIZATION=self._auth_header)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user = User.objects.get(username=self._user['username'])
+        self.assertEqual(user.email, 'new@domain.com')
+        self.assertTrue(user.check_password(password))
+
+    def test_checking_current_password(self):
+        self._authenticate()
+        # Another process changes the password, so the cached hash is outdated.
+        user = User.objects.get(username=self._user['username'])
+        user.set_password('ChangedElsewhere')
+        User.objects.filter(pk=user.pk).update(password=user.password)
+
+        url = reverse('user-profile-delete', kwargs={'version': 'v1'})
+        response = self.client.post(url, data=json.dumps(self._user),
+                                    content_type='application/json',
+                                    HTTP_AUTHORIZATION=self._auth_header)
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(User.objects.filter(pk=user.pk).exists())
+
+    def test_seeing_deleted_user(self):
+        self._authenticate()
+
+        User.objects.get(username=self._user['username']).delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self._authenticate()
+
+    def test_seeing_changes_of_person(self):
+        user = User.objects.get(username=self._user['username'])
+        user.person.email_confirmed = False
+        user.person.save(update_fields=['email_confirmed'])
+        self.assertFalse(user_cache.get(user.pk).person.email_confirmed)
+
+        EmailConfirmationToken.objects.confirm(user.person.emailconfirmationtoken.token)
+
+        self.assertTrue(user_cache.get(user.pk).person.email_confirmed)
+
+    def test_sharing_cache(self):
+        user_id = User.objects.get(username=self._user['username']).pk
+        with self.settings(AUTH_USER_CACHE_ALIAS='default'):
+            self._authenticate()
+
+            # Another process doesn't have to query the database.
+            user_cache.clear()
+            with self.assertNumQueries(0):
+                self._authenticate()
+
+            # Another process changes the user.
+            user_cache.clear()
+            User.objects.filter(pk=user_id).update(email='new.email@domain.com')
+            user_cache.invalidate(user_id)
+            self.assertEqual(self._authenticate().email, 'new.email@domain.com')
+
+
+class KeySetTokenBackendTest(BaseSingleUserTest):
+    """Tests signing the tokens with key pairs. """
+
+    def setUp(self):
+        super().setUp()
+
+        self._tmp_dir = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self._tmp_dir.cleanup)
+
+    def _write_key(self, name, private_key, public=False):
+        """Writes the private (or public) key in the PEM format and returns the file path. """
+
+        if public:
+            data = private_key.public_key().public_bytes(
+                serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo,
+            )
+        else:
+            data = private_key.private_bytes(
+                serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                serialization.NoEncryption(),
+            )
+
+        path = os.path.join(self._tmp_dir.name, name)
+        with open(path, 'wb') as outfile:
+            outfile.write(data)
+
+        return path
+
+    def _install(self, algorithm, signing_key_file, verifying_key_files=()):
+        """Makes simplejwt use the backend with the specified keys until the test ends. """
+
+        with self.settings(JWT_ALGORITHM=algorithm, JWT_SIGNING_KEY_FILE=signing_key_file,
+                           JWT_VERIFYING_KEY_FILES=list(verifying_key_files)):
+            backend = KeySetTokenBackend.from_settings()
+
+        patcher = mock.patch.object(state, 'token_backend', backend)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        return backend
+
+    def _whoami(self):
+        url = reverse('who-am-i', kwargs={'version': 'v1'})
+        return self.client.get(url, HTTP_AUTHORIZATION=self._get_auth_header())
+
+    def test_signing_with_ed25519(self):
+        backend = self._install('EdDSA', self._write_key('key.pem',
+                                                         ed25519.Ed25519PrivateKey.generate()))
+
+        access = self._get_auth_header().split()[1].decode()
+        self.assertEqual(jwt.get_unverified_header(access)['kid'], backend.key_id)
+        self.assertEqual(jwt.get_unverified_header(access)['alg'], 'EdDSA')
+
+        response = self._whoami()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['username'], self._user['username'])
+
+    def test_signing_with_rsa(self):
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        self._install('RS256', self._write_key('key.pem', private_key))
+
+        self.assertEqual(self._whoami().status_code, status.HTTP_200_OK)
+
+    def test_publishing_keys(self):
+        old_key = ed25519.Ed25519PrivateKey.generate()
+        backend = self._install(
+            'EdDSA', self._write_key('key.pem', ed25519.Ed25519PrivateKey.generate()),
+            [self._write_key('old.pem', old_key, public=True)],
+        )
+
+        response = self.client.get(reverse('jwks', kwargs={'version': 'v1'}))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('max-age', response['Cache-Control'])
+        keys = response.json()['keys']
+        self.assertEqual([key['kid'] for key in keys], [jwk['kid'] for jwk in backend.jwks])
+        self.assertEqual(len(keys), 2)
+        for key in keys:
+            self.assertEqual((key['kty'], key['crv'], key['alg']), ('OKP', 'Ed25519', 'EdDSA'))
+            self.assertNotIn('d', key)
+
+    def test_publishing_no_keys(self):
+        response = self.client.get(reverse('jwks', kwargs={'version': 'v1'}))
+
+        self.assertEqual(response.json(), {'keys': []})
+
+    def test_rotating_keys(self):
+        old_key = ed25519.Ed25519PrivateKey.generate()
+        self._install('EdDSA', self._write_key('old.pem', old_key))
+        old_header = self._get_auth_header()
+
+        # The next key pair is put in use keeping the public key of the previous one.
+        self._install('EdDSA', self._write_key('new.pem', ed25519.Ed25519PrivateKey.generate()),
+                      [self._write_key('old.pub', old_key, public=True)])
+
+        url = reverse('who-am-i', kwargs={'version': 'v1'})
+        response = self.client.get(url, HTTP_AUTHORIZATION=old_header)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self._whoami().status_code, status.HTTP_200_OK)
+
+    def test_rejecting_unknown_keys(self):
+        self._install('EdDSA', self._write_key('key.pem', ed25519.Ed25519PrivateKey.generate()))
+        header = self._get_auth_header()
+
+        self._install('EdDSA', self._write_key('other.pem',
+                                               ed25519.Ed25519PrivateKey.generate()))
+        url = reverse('who-am-i', kwargs={'version': 'v1'})
+        response = self.client.get(url, HTTP_AUTHORIZATION=header)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        with self.assertRaises(TokenBackendError):
+            state.token_backend.decode(header.split()[1].decode())
+
+    def test_rejecting_keys_not_suiting_algorithm(self):
+        rsa_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        for algorithm, signing_key, verifying_keys in (
+                ('HS256', rsa_key, ()),
+                ('ES256', rsa_key, ()),
+                ('RS256', ec.generate_private_key(ec.SECP256R1()), ()),
+                ('RS256', rsa_key, (ed25519.Ed25519PrivateKey.generate(), )),
+        ):
+            with self.subTest(algorithm=algorithm), self.settings(
+                    JWT_ALGORITHM=algorithm,
+                    JWT_SIGNING_KEY_FILE=self._write_key('key.pem', signing_key),
+                    JWT_VERIFYING_KEY_FILES=[self._write_key(f'old{i}.pem', key, public=True)
+                                             for i, key in enumerate(verifying_keys)],
+            ):
+                with self.assertRaises(ImproperlyConfigured):
+                    install_token_backend()
+
+    def test_rejecting_public_signing_key(self):
+        key_file = self._write_key('key.pem', ed25519.Ed25519PrivateKey.generate(), public=True)
+
+        with self.settings(JWT_ALGORITHM='EdDSA', JWT_SIGNING_KEY_FILE=key_file):
+            with self.assertRaises(ImproperlyConfigured):
+                install_token_backend()
+
+    def test_rejecting_symmetric_tokens(self):
+        header = self._get_auth_header()
+
+        self._install('EdDSA', self._write_key('key.pem', ed25519.Ed25519PrivateKey.generate()))
+        url = reverse('who-am-i', kwargs={'version': 'v1'})
+        response = self.client.get(url, HTTP_AUTHORIZATION=header)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class TokenRevocationTest(BaseSingleUserTest):
+    """Tests revoking the tokens. """
+
+    def setUp(self):
+        super().setUp()
+
+        revocation_store.clear()
+        self._tokens = self._obtain_tokens()
+
+    def _obtain_tokens(self):
+        url = reverse('token-obtain-pair', kwargs={'version': 'v1'})
+        return self.client.post(url, data=json.dumps(self._user),
+                                content_type='application/json').json()
+
+    def _refresh(self, refresh):
+        url = reverse('token-refresh', kwargs={'version': 'v1'})
+        return self.client.post(url, data=json.dumps({'refresh': refresh}),
+                                content_type='application/json')
+
+    def _whoami(self, access):
+        url = reverse('who-am-i', kwargs={'version': 'v1'})
+        return self.client.get(url, HTTP_AUTHORIZATION=b'Bearer ' + access.encode())
+
+    def test_revoking_refresh_token(self):
+        url = reverse('token-revoke', kwargs={'version': 'v1'})
+        data = json.dumps({'refresh': self._tokens['refresh']})
+        response = self.client.post(url, data=data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response = self._refresh(self._tokens['refresh'])
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        response = self.client.post(url, data=data, content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # The other sessions of the user are intact.
+        response = self._refresh(self._obtain_tokens()['refresh'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_revoking_tokens_on_password_update(self):
+        password = 'SuperSecret'
+        data = {
+            'old_password': self._user['password'],
+            'password': password,
+            'retype_password': password,
+        }
+        url = reverse('password-update', kwargs={'version': 'v1'})
+        response = self.client.post(url, data=json.dumps(data), content_type='application/json',
+                                    HTTP_AUTHORIZATION=b'Bearer ' + self._tokens['access'].encode())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        tokens = response.json()
+
+        self.assertEqual(self._whoami(self._tokens['access']).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self._refresh(self._tokens['refresh']).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+        self.assertEqual(self._whoami(tokens['access']).status_code, status.HTTP_200_OK)
+        self.assertEqual(self._refresh(tokens['refresh']).status_code, status.HTTP_200_OK)
+
+    def test_revoking_tokens_on_password_reset(self):
+        user = User.objects.get(username=self._user['username'])
+        post_password_reset.send(sender=self.__class__, user=user)
+
+        self.assertEqual(self._refresh(self._tokens['refresh']).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoking_tokens_on_profile_deletion(self):
+        url = reverse('user-profile-delete', kwargs={'version': 'v1'})
+        response = self.client.post(url, data=json.dumps(self._user),
+                                    content_type='application/json',
+                                    HTTP_AUTHORIZATION=b'Bearer ' + self._tokens['access'].encode())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # The identity-only endpoints don't look the user up.
+        self.assertEqual(self._whoami(self._tokens['access']).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self._refresh(self._tokens['refresh']).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_revoking_tokens_on_user_deletion(self):
+        User.objects.get(username=self._user['username']).delete()
+
+        self.assertEqual(self._whoami(self._tokens['access']).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_checking_without_queries(self):
+        self._whoami(self._tokens['access'])
+
+        with self.assertNumQueries(0):
+            response = self._whoami(self._tokens['access'])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_sizing_filter_for_revoked_tokens(self):
+        expires_at = timezone.now() + timedelta(minutes=5)
+        for i in range(5):
+            RevokedToken.objects.revoke_token(f'revoked-{i}', expires_at)
+
+        with self.settings(TOKEN_REVOCATION_BLOOM_CAPACITY=2):
+            self._whoami(self._tokens['access'])
+
+            # The filter isn't full, so it isn't rebuilt.
+            with self.assertNumQueries(0):
+                response = self._whoami(self._tokens['access'])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_refreshing_without_holding_lock(self):
+        load = TokenRevocationStore._load  # pylint: disable=protected-access
+        locked = []
+
+        def checking_load(since=None):
+            locked.append(revocation_store._lock.locked())  # pylint: disable=protected-access
+            return load(since)
+
+        with mock.patch.object(TokenRevocationStore, '_load', staticmethod(checking_load)):
+            response = self._whoami(self._tokens['access'])
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(locked, [False])
+
+    def test_seeing_revocations_of_other_processes(self):
+        self._whoami(self._tokens['access'])
+
+        # Another process revokes the token.
+        token = AccessToken(self._tokens['access'])
+        RevokedToken.objects.revoke_token(token['jti'],
+                                          timezone.now() + timedelta(minutes=5))
+
+        with self.settings(TOKEN_REVOCATION_REFRESH_INTERVAL=0):
+            self.assertEqual(self._whoami(self._tokens['access']).status_code,
+                             status.HTTP_401_UNAUTHORIZED)
+
+    def test_purging_expired_revocations(self):
+        now = timezone.now()
+        for i in range(5):
+            RevokedToken.objects.revoke_token(f'expired-{i}', now - timedelta(seconds=1))
+        RevokedToken.objects.revoke_token('unexpired', now + timedelta(minutes=5))
+
+        out = StringIO()
+        call_command('purge_revoked_tokens', '--batch-size', '2', stdout=out)
+
+        self.assertIn('Deleted 5', out.getvalue())
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)),
+                         ['unexpired'])
+
+    def test_bloom_filter(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f'revoked-{i}')
+
+        self.assertTrue(all(f'revoked-{i}' in bloom for i in range(1000)))
+        false_positives = sum(f'unrevoked-{i}' in bloom for i in range(10000))
+        self.assertLess(false_positives, 300)
+
+
+class ThrottlingTest(BaseSingleUserTest):
+    """Tests throttling the requests to the authentication endpoints. """
+
+    def _obtain_tokens(self, username, **extra):
+        url = reverse('token-obtain-pair', kwargs={'version': 'v1'})
+        data = {'username': username, 'password': 'wrong'}
+        return self.client.post(url, data=json.dumps(data), content_type='application/json',
+                                **extra)
+
+    def test_throttling_by_username(self):
+        with self.settings(AUTH_THROTTLE_USERNAME_RATE='3/min'):
+            for i in range(3):
+                response = self._obtain_tokens(self._user['username'], REMOTE_ADDR=f'10.0.0.{i}')
+                self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+            # Neither the user is queried nor the password is hashed.
+            with self.assertNumQueries(0):
+                response = self._obtain_tokens(self._user['username'].upper(),
+                                               REMOTE_ADDR='10.0.0.100')
+
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertIn('Retry-After', response)
+
+            response = self._obtain_tokens('another.user')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_throttling_by_ip(self):
+        with self.settings(AUTH_THROTTLE_IP_RATE='3/min'):
+            for i in range(3):
+                self._obtain_tokens(f'user{i}')
+
+            response = self._obtain_tokens('user3')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+            response = self._obtain_tokens('user3', REMOTE_ADDR='10.0.0.1')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+            # Every endpoint has its own limits.
+            url = reverse('confirm-email', kwargs={'version': 'v1'})
+            response = self.client.post(url, data=json.dumps({'token': '00000000'}),
+                                        content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_throttling_by_ip_with_spoofed_forwarded_for(self):
+        with self.settings(AUTH_THROTTLE_IP_RATE='1/min'):
+            self._obtain_tokens('user0')
+
+            response = self._obtain_tokens('user1', HTTP_X_FORWARDED_FOR='10.0.0.1')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_throttling_by_ip_behind_proxy(self):
+        rest_framework = {**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}
+        with self.settings(AUTH_THROTTLE_IP_RATE='1/min', REST_FRAMEWORK=rest_framework):
+            self._obtain_tokens('user0', HTTP_X_FORWARDED_FOR='10.0.0.1')
+
+            response = self._obtain_tokens('user1', HTTP_X_FORWARDED_FOR='10.0.0.2')
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+            response = self._obtain_tokens('user2', HTTP_X_FORWARDED_FOR='10.0.0.2')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_checking_rates(self):
+        for rate in ('10', '10/fortnight', '0/min', 'ten/min'):
+            with self.subTest(rate=rate), self.settings(AUTH_THROTTLE_IP_RATE=rate):
+                with self.assertRaises(ImproperlyConfigured):
+                    check_rates()
+
+        with self.settings(AUTH_THROTTLE_IP_RATE='', AUTH_THROTTLE_USERNAME_RATE='5/hour'):
+            check_rates()
+
+    def test_throttling_by_endpoint(self):
+        with self.settings(AUTH_THROTTLE_ENDPOINT_RATE='3/min'):
+            for i in range(3):
+                self._obtain_tokens(f'user{i}', REMOTE_ADDR=f'10.0.0.{i}')
+
+            response = self._obtain_tokens('user3', REMOTE_ADDR='10.0.0.3')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_throttling_password_reset(self):
+        url = reverse('password_reset:reset-password-request', kwargs={'version': 'v1'})
+        with self.settings(AUTH_THROTTLE_USERNAME_RATE='1/min'):
+            data = json.dumps({'email': self._user['email']})
+            response = self.client.post(url, data=data, content_type='application/json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            response = self.client.post(url, data=data, content_type='application/json',
+                                        REMOTE_ADDR='10.0.0.1')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+        self.assertEqual(OutgoingEmail.objects.filter(subject__startswith='Password').count(), 1)
+
+    def test_sharing_buckets(self):
+        with self.settings(AUTH_THROTTLE_IP_RATE='1/min', AUTH_THROTTLE_CACHE_ALIAS='default'):
+            self._obtain_tokens('user0')
+
+            response = self._obtain_tokens('user1')
+            self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_refilling_bucket(self):
+        bucket, wait = take_token((0.0, 0.0), 0.5, 2, 1.0)
+        self.assertEqual((bucket, wait), ((0.5, 0.5), 0.5))
+
+        bucket, wait = take_token(bucket, 1.0, 2, 1.0)
+        self.assertEqual((bucket, wait), ((0.0, 1.0), 0.0))
+
+        # The bucket holds up to its capacity.
+        bucket, wait = take_token(bucket, 100.0, 2, 1.0)
+        self.assertEqual((bucket, wait), ((1.0, 100.0), 0.0))
@@ -0,0 +1,189 @@
+"""Module containing the throttles of the authentication endpoints. """
+
+import abc
+import hashlib
+import math
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+RATE_RE = re.compile(r'^([1-9]\d*)/([smhd])[a-z]*$')
+
+
+def parse_rate(rate):
+    """Parses the rate like '10/min' into the number of the requests and the period (in
+    seconds). Returns None if the rate is empty and raises ValueError if it's malformed.
+    """
+
+    if not rate:
+        return None
+
+    match = RATE_RE.match(rate)
+    if not match:
+        raise ValueError(f"Invalid rate '{rate}'. The rate must look like 10/min (per second, "
+                         f"minute, hour or day).")
+
+    return int(match.group(1)), PERIODS[match.group(2)]
+
+
+def take_token(bucket, now, capacity, refill_rate):
+    """Takes a token from the bucket, which is the number of the tokens in it and the time it
+    was updated at. Returns the new state of the bucket and how long (in seconds) to wait for
+    the next token if the bucket is empty or 0.0 if a token has been taken.
+    """
+
+    tokens, updated_at = bucket
+    tokens = min(capacity, tokens + max(0.0, now - updated_at) * refill_rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0.0
+
+    return (tokens, now), (1 - tokens) / refill_rate
+
+
+class TokenBucketStore:
+    """Token buckets of the throttles. The buckets are kept by every process (up to
+    AUTH_THROTTLE_MAX_BUCKETS of them, the least recently used ones are dropped) unless
+    AUTH_THROTTLE_CACHE_ALIAS is set, in which case they are kept in the specified shared cache
+    (memcached or Redis, for example), so the limits apply to all the processes together.
+
+    The buckets in the shared cache are read and written without locking, so the concurrent
+    requests may occasionally take the same token.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def consume(self, key, capacity, period):
+        """Takes a token from the bucket with the specified key, which holds up to 'capacity'
+        tokens and is refilled completely in 'period' seconds. Returns how long (in seconds) to
+        wait for the next token if the bucket is empty or 0.0 if a token has been taken.
+        """
+
+        refill_rate = capacity / period
+        alias = settings.AUTH_THROTTLE_CACHE_ALIAS
+        if alias:
+            shared_cache = caches[alias]
+            now = time.time()
+            bucket, wait = take_token(shared_cache.get(key, (capacity, now)), now, capacity,
+                                      refill_rate)
+            # An untouched bucket is full again in 'period' seconds, so it needn't be kept.
+            shared_cache.set(key, bucket, math.ceil(period))
+            return wait
+
+        with self._lock:
+            now = time.monotonic()
+            bucket, wait = take_token(self._buckets.get(key, (capacity, now)), now, capacity,
+                                      refill_rate)
+            self._buckets[key] = bucket
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > settings.AUTH_THROTTLE_MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+
+        return wait
+
+    def clear(self):
+        """Drops all the buckets of the current process. """
+
+        with self._lock:
+            self._buckets.clear()
+
+
+bucket_store = TokenBucketStore()  # pylint: disable=invalid-name
+
+
+class TokenBucketThrottle(BaseThrottle, metaclass=abc.ABCMeta):
+    """Base class of the token bucket throttles. Every view has its own buckets, which are told
+    by its 'throttle_scope' attribute. The rate is taken from the setting named by
+    'rate_setting'. An empty rate disables the throttle.
+    """
+
+    rate_setting = None
+
+    def __init__(self):
+        self._wait = 0.0
+
+    @abc.abstractmethod
+    def get_key(self, request, view):
+        """Returns the key of the bucket the request takes a token from or None if the request
+        is not throttled.
+        """
+
+    def allow_request(self, request, view):
+        rate = parse_rate(getattr(settings, self.rate_setting))
+        key = self.get_key(request, view)
+        if rate is None or key is None:
+            return True
+
+        scope = getattr(view, 'throttle_scope', type(view).__name__)
+        self._wait = bucket_store.consume(f'throttle:{scope}:{self.rate_setting}:{key}', *rate)
+
+        return self._wait == 0.0
+
+    def wait(self):
+        return self._wait
+
+
+class IPThrottle(TokenBucketThrottle):
+    """Throttles the requests from the same IP address, which is taken from X-Forwarded-For only
+    if the API is behind proxies (see NUM_PROXIES), so that it can't be spoofed.
+    """
+
+    rate_setting = 'AUTH_THROTTLE_IP_RATE'
+
+    def get_key(self, request, view):
+        return self.get_ident(request)
+
+
+class UsernameThrottle(TokenBucketThrottle):
+    """Throttles the requests on behalf of the same username (or email), so that guessing the
+    password of an account from a lot of IP addresses is throttled too. The username is taken
+    from the request body, so the requests without it aren't throttled.
+    """
+
+    rate_setting = 'AUTH_THROTTLE_USERNAME_RATE'
+
+    def get_key(self, request, view):
+        data = request.data if hasattr(request.data, 'get') else {}
+        username = data.get('username') or data.get('email')
+        if not isinstance(username, str) or not username.strip():
+            return None
+
+        # The usernames may contain the characters which aren't allowed in the cache keys.
+        return hashlib.sha1(username.strip().upper().encode()).hexdigest()
+
+
+class EndpointThrottle(TokenBucketThrottle):
+    """Throttles all the requests to the endpoint, which caps the load (password hashing and
+    sending emails, for example) a distributed burst can cause.
+    """
+
+    rate_setting = 'AUTH_THROTTLE_ENDPOINT_RATE'
+
+    def get_key(self, request, view):
+        return ''
+
+
+# The throttles are checked in this order and a rejected request doesn't take tokens from the
+# next buckets, so a burst from one IP address doesn't exhaust the bucket of the endpoint.
+AUTH_THROTTLE_CLASSES = (IPThrottle, UsernameThrottle, EndpointThrottle)
+
+
+def check_rates():
+    """Checks that the rates of all the throttles are well-formed, so that a misconfigured rate
+    is reported on start rather than failing every request.
+    """
+
+    for throttle_class in AUTH_THROTTLE_CLASSES:
+        try:
+            parse_rate(getattr(settings, throttle_class.rate_setting))
+        except ValueError as exc:
+            raise ImproperlyConfigured(f'{throttle_class.rate_setting}: {exc}') from exc
@@ -0,0 +1,161 @@
+"""Module containing the backend signing and verifying the JWT tokens with key pairs, so that the
+other services can verify the tokens on their own using the public keys (see JWKSView).
+"""
+
+import base64
+import hashlib
+import json
+
+import jwt
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.translation import gettext_lazy as _
+from jwt.algorithms import get_default_algorithms
+from rest_framework_simplejwt.backends import TokenBackend
+from rest_framework_simplejwt.exceptions import TokenBackendError
+
+# The types of the keys (the 'kty' members of their JWKs) the families of the asymmetric
+# algorithms take, by the prefix of the algorithm names.
+KEY_TYPES = {
+    'RS': 'RSA',
+    'PS': 'RSA',
+    'ES': 'EC',
+    'Ed': 'OKP',
+}
+
+# The members of the JWKs the thumbprints are computed over (see RFC 7638).
+THUMBPRINT_MEMBERS = {
+    'RSA': ('e', 'kty', 'n'),
+    'EC': ('crv', 'kty', 'x', 'y'),
+    'OKP': ('crv', 'kty', 'x'),
+}
+
+
+def _read_key(path):
+    with open(path, 'rb') as infile:
+        return infile.read()
+
+
+class KeySetTokenBackend(TokenBackend):  # pylint: disable=too-many-instance-attributes
+    """Token backend signing the tokens with the private key of the current key pair and
+    verifying them with the public key of any of the key pairs in use, which is selected by the
+    id of the key ('kid') in the header of the token. Any asymmetric algorithm supported by
+    PyJWT (RS256, ES256 or EdDSA, for example) can be used.
+
+    To rotate the keys, start signing the tokens with a new key pair keeping the public key of
+    the previous one among the verifying keys until all the tokens signed with it expire.
+    """
+
+    def __init__(self, algorithm, signing_key,  # pylint: disable=super-init-not-called
+                 verifying_keys=(), audience=None, issuer=None):
+        # TokenBackend.__init__ is not called since it only accepts the HS* and RS* algorithms.
+        key_type = KEY_TYPES.get(algorithm[:2])
+        try:
+            self._algorithm = get_default_algorithms()[algorithm]
+        except KeyError as exc:
+            raise TokenBackendError(f"Unrecognized algorithm type '{algorithm}'") from exc
+        if key_type is None:
+            raise TokenBackendError(f"'{algorithm}' is not an asymmetric algorithm")
+
+        self.algorithm = algorithm
+        self.audience = audience
+        self.issuer = issuer
+
+        try:
+            self.signing_key = self._algorithm.prepare_key(signing_key)
+            public_keys = [self.signing_key.public_key()]
+            public_keys.extend(self._algorithm.prepare_key(key) for key in verifying_keys)
+        except AttributeError as exc:
+            raise TokenBackendError('The signing key must be a private key') from exc
+        except (jwt.InvalidKeyError, ValueError, TypeError) as exc:
+            raise TokenBackendError(f"The keys don't suit '{algorithm}': {exc}") from exc
+
+        self.jwks = []
+        self.verifying_keys = {}
+        for public_key in public_keys:
+            jwk = json.loads(self._algorithm.to_jwk(public_key))
+            if jwk['kty'] != key_type:
+                raise TokenBackendError(f"The keys of '{algorithm}' must be {key_type} keys")
+            jwk.update({'kid': self.get_key_id(jwk), 'alg': algorithm, 'use': 'sig'})
+            if jwk['kid'] not in self.verifying_keys:
+                self.jwks.append(jwk)
+                self.verifying_keys[jwk['kid']] = public_key
+
+        self.verifying_key = public_keys[0]
+        self.key_id = self.jwks[0]['kid']
+
+    @classmethod
+    def from_settings(cls):
+        """Creates the backend using the keys from the files specified by JWT_SIGNING_KEY_FILE
+        and JWT_VERIFYING_KEY_FILES.
+        """
+
+        return cls(
+            settings.JWT_ALGORITHM,
+            _read_key(settings.JWT_SIGNING_KEY_FILE),
+            [_read_key(path) for path in settings.JWT_VERIFYING_KEY_FILES],
+            audience=settings.SIMPLE_JWT.get('AUDIENCE'),
+            issuer=settings.SIMPLE_JWT.get('ISSUER'),
+        )
+
+    @staticmethod
+    def get_key_id(jwk):
+        """Returns the id of the key, which is the thumbprint of its JWK (see RFC 7638). """
+
+        members = {member: jwk[member] for member in THUMBPRINT_MEMBERS[jwk['kty']]}
+        digest = hashlib.sha256(
+            json.dumps(members, separators=(',', ':'), sort_keys=True).encode()
+        ).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+
+    def encode(self, payload):
+        jwt_payload = payload.copy()
+        if self.audience is not None:
+            jwt_payload['aud'] = self.audience
+        if self.issuer is not None:
+            jwt_payload['iss'] = self.issuer
+
+        token = jwt.encode(jwt_payload, self.signing_key, algorithm=self.algorithm,
+                           headers={'kid': self.key_id})
+        if isinstance(token, bytes):
+            # For PyJWT <= 1.7.1
+            return token.decode('utf-8')
+
+        return token
+
+    def decode(self, token, verify=True):
+        try:
+            key_id = jwt.get_unverified_header(token).get('kid')
+        except jwt.InvalidTokenError as exc:
+            raise TokenBackendError(_('Token is invalid or expired')) from exc
+
+        verifying_key = self.verifying_keys.get(key_id)
+        if verifying_key is None:
+            raise TokenBackendError(_('Token is invalid or expired'))
+
+        try:
+            return jwt.decode(token, verifying_key, algorithms=[self.algorithm],
+                              audience=self.audience, issuer=self.issuer,
+                              options={'verify_aud': self.audience is not None,
+                                       'verify_signature': verify})
+        except jwt.InvalidAlgorithmError as exc:
+            raise TokenBackendError(_('Invalid algorithm specified')) from exc
+        except jwt.InvalidTokenError as exc:
+            raise TokenBackendError(_('Token is invalid or expired')) from exc
+
+
+def install_token_backend():
+    """Makes simplejwt sign and verify the tokens with KeySetTokenBackend if JWT_SIGNING_KEY_FILE
+    is set. Otherwise, the tokens are signed with SECRET_KEY. Raises ImproperlyConfigured if
+    JWT_ALGORITHM doesn't suit the keys (a key file with HS256, for example).
+    """
+
+    if not settings.JWT_SIGNING_KEY_FILE:
+        return
+
+    from rest_framework_simplejwt import state  # pylint: disable=import-outside-toplevel
+
+    try:
+        state.token_backend = KeySetTokenBackend.from_settings()
+    except TokenBackendError as exc:
+        raise ImproperlyConfigured(f'JWT_ALGORITHM and the JWT key files mismatch: {exc}') from exc
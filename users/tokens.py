@@ -0,0 +1,88 @@
+"""Module containing the JWT tokens issued by the CusDeb API. """
+
+from django.conf import settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from users.revocation import revocation_store
+
+
+def get_identity_claims(user):
+    """Returns the claims describing the identity of the specified user. """
+
+    return {
+        'username': user.username,
+        'email': user.email,
+        'email_confirmed': user.person.email_confirmed,
+    }
+
+
+def set_identity_claims(token, user):
+    """Embeds the identity of the specified user into the token if JWT_IDENTITY_CLAIMS is
+    enabled.
+    """
+
+    if settings.JWT_IDENTITY_CLAIMS:
+        for claim, value in get_identity_claims(user).items():
+            token[claim] = value
+
+
+class RevocableTokenMixin:
+    """Makes the tokens check whether they are revoked (see TokenRevocationStore) when they are
+    verified.
+    """
+
+    def get_issued_at(self):
+        """Returns the time (seconds since the epoch) the token was issued at. The access tokens
+        inherit it from the refresh tokens they are issued with. The tokens issued without
+        the 'iat' claim are assumed to be issued a lifetime before they expire.
+        """
+
+        if 'iat' in self.payload:
+            return self.payload['iat']
+
+        return self.payload['exp'] - self.lifetime.total_seconds()
+
+    def verify(self):
+        """Rejects the revoked token in addition to the default checks. """
+
+        super().verify()
+
+        if revocation_store.is_revoked(self.payload[api_settings.JTI_CLAIM],
+                                       self.payload.get(api_settings.USER_ID_CLAIM),
+                                       self.get_issued_at()):
+            raise TokenError(_('Token is revoked'))
+
+    def revoke(self):
+        """Revokes the token. """
+
+        revocation_store.revoke_token(self.payload[api_settings.JTI_CLAIM], self.payload['exp'])
+
+
+class RevocableAccessToken(RevocableTokenMixin, AccessToken):
+    """Access token which is rejected once revoked. """
+
+
+class IdentityRefreshToken(RevocableTokenMixin, RefreshToken):
+    """Refresh token carrying the identity of the user (the username, email and whether the
+    email is confirmed), which is copied to the access tokens, so that the identity-only
+    endpoints (see WhoAmIView) can answer without touching the database. The token is rejected
+    once revoked.
+    """
+
+    def __init__(self, token=None, verify=True):
+        super().__init__(token, verify)
+
+        if token is None:
+            # The fractions of a second tell the tokens issued right after all the tokens of
+            # the user are revoked from the revoked ones.
+            self.payload['iat'] = self.current_time.timestamp()
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        set_identity_claims(token, user)
+
+        return token
@@ -10,7 +10,7 @@ from .views import ConfirmEmailView, WhoAmIView, PasswordUpdate, UserLoginUpdate
 urlpatterns = [  # pylint: disable=invalid-name
     re_path('confirm_email/?$', ConfirmEmailView.as_view(), name='confirm-email'),
     re_path('whoami/?$', WhoAmIView.as_view(), name='who-am-i'),
-    re_path('password_reset/?', include('django_rest_passwordreset.urls',
+    re_path('password_reset/?', include('users.password_reset_urls',
                                         namespace='password_reset')),
     re_path('password_update/?', PasswordUpdate.as_view(), name='password-update'),
     re_path('login_update/?', UserLoginUpdate.as_view(), name='user-login-update'),
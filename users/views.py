@@ -5,28 +5,45 @@ from django.contrib.auth import REDIRECT_FIELD_NAME
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.http import JsonResponse
+from django.utils.translation import gettext_lazy as _
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt, csrf_protect
 from django.views.decorators.http import require_POST
 from django.views.decorators.cache import never_cache
 from rest_framework import generics
 from rest_framework import permissions
+from rest_framework.exceptions import NotFound
 from rest_framework.generics import GenericAPIView
 from rest_framework.response import Response
 from rest_framework.views import status
+from rest_framework_simplejwt import state
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenViewBase
+from django_rest_passwordreset.views import (
+    ResetPasswordConfirm,
+    ResetPasswordRequestToken,
+    ResetPasswordValidateToken,
+)
 from social_core.actions import do_auth, do_complete, do_disconnect
 from social_core.utils import setting_name
 from social_django.views import _do_login
 
-from .models import clear_expired_email_confirmation_tokens, EmailConfirmationToken
+from .authentication import IdentityTokenAuthentication, user_cache
+from .models import EmailConfirmationToken
+from .revocation import revocation_store
 from .serializers import (
     ConfirmEmailSerializer,
     CurrentUserSerializer,
+    IdentityTokenObtainPairSerializer,
+    IdentityTokenRefreshSerializer,
     SocialTokenObtainPairSerializer,
     PasswordUpdateSerializer,
+    TokenRevokeSerializer,
     UserLoginUpdateSerializer,
     UserProfileDeleteSerializer,
 )
+from .throttling import AUTH_THROTTLE_CLASSES
+from .tokens import IdentityRefreshToken
 from .utils import psa
 
 
@@ -37,6 +54,8 @@ class SignUpView(generics.CreateAPIView):
     """Creates a User model instance. """
 
     permission_classes = (permissions.AllowAny, )
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = 'sign-up'
 
     def post(self, request, *args, **kwargs):
         username = request.data.get('username', '')
@@ -71,38 +90,55 @@ class SignUpView(generics.CreateAPIView):
 
 
 class WhoAmIView(generics.RetrieveAPIView):
-    """Returns the name of the authenticated user the request is sent on behalf of. """
+    """Returns the name of the authenticated user the request is sent on behalf of. The name is
+    taken from the token if it carries the identity of the user (see IdentityRefreshToken) and
+    from the user otherwise.
+    """
 
     queryset = User.objects.all()
     serializer_class = CurrentUserSerializer
+    authentication_classes = (IdentityTokenAuthentication, )
     permission_classes = (permissions.IsAuthenticated,)
 
+    def retrieve(self, request, *args, **kwargs):
+        token = request.auth
+        if 'username' in token and 'email' in token:
+            return Response({'username': token['username'], 'email': token['email']})
+
+        return super().retrieve(request, *args, **kwargs)
+
     def get_object(self):
-        return self.request.user
+        user = user_cache.get(self.request.user.id)
+        if user is None:
+            raise NotFound
+
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+
+        return user
 
 
 class ConfirmEmailView(GenericAPIView):
-    """Confirms the user email and clears all expired tokens. """
+    """Confirms the user email. """
 
     permission_classes = (permissions.AllowAny, )
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = 'confirm-email'
 
     def post(self, request, *_args, **_kwargs):
         """POST-method for confirming email. """
 
-        clear_expired_email_confirmation_tokens()
-
         token = request.data.get('token', '')
 
         serializer = ConfirmEmailSerializer(data={'token': token})
         if serializer.is_valid():
-            email_confirmation_token = EmailConfirmationToken.objects.get(
-                token=serializer.validated_data['token']
-            )
-            email_confirmation_token.person.email_confirmed = True
-            email_confirmation_token.person.save(update_fields=['email_confirmed'])
-            email_confirmation_token.delete()
+            # Both the token and the email are checked and changed by one statement, so an
+            # invalid or expired token is only told by nothing being changed.
+            if EmailConfirmationToken.objects.confirm(serializer.validated_data['token']):
+                return Response(status=status.HTTP_200_OK)
 
-            return Response(status=status.HTTP_200_OK)
+            return JsonResponse({'token': ["Token doesn't exist."]},
+                                status=status.HTTP_400_BAD_REQUEST)
 
         return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -122,6 +158,16 @@ class GetTokenForSocial(View):
         return JsonResponse(serializer.errors, status=400)
 
 
+def get_current_user(request):
+    """Returns the user the request is sent on behalf of as it's stored in the database. The
+    request user may be a copy of the user cached by another request (see
+    CachedJWTAuthentication), so it must be neither written back nor used to check the
+    credentials.
+    """
+
+    return User.objects.select_related('person').get(pk=request.user.pk)
+
+
 class PasswordUpdate(generics.CreateAPIView):
     """Update the current user password. """
 
@@ -132,20 +178,26 @@ class PasswordUpdate(generics.CreateAPIView):
         password = request.data.get('password', '')
         retype_password = request.data.get('retype_password', '')
 
+        user = get_current_user(request)
         serializer = PasswordUpdateSerializer(
             data={
                 'old_password': old_password,
                 'password': password,
                 'retype_password': retype_password,
             },
-            current_user=request.user,
+            current_user=user,
         )
 
         if serializer.is_valid():
-            request.user.set_password(serializer.validated_data['password'])
-            request.user.save()
+            user.set_password(serializer.validated_data['password'])
+            user.save(update_fields=['password'])
 
-            return Response(status=status.HTTP_200_OK)
+            # The tokens issued before may have been issued to someone who knew the previous
+            # password, so revoke them and give the new ones.
+            revocation_store.revoke_user_tokens(user.id)
+            refresh = IdentityRefreshToken.for_user(user)
+            return Response({'refresh': str(refresh), 'access': str(refresh.access_token)},
+                            status=status.HTTP_200_OK)
 
         return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -165,15 +217,75 @@ class UserLoginUpdate(generics.CreateAPIView):
         )
 
         if serializer.is_valid():
-            request.user.username = serializer.validated_data['username']
-            request.user.email = serializer.validated_data['email']
-            request.user.save(update_fields=['username', 'email'])
+            user = get_current_user(request)
+            user.username = serializer.validated_data['username']
+            user.email = serializer.validated_data['email']
+            user.save(update_fields=['username', 'email'])
 
-            return Response(status=status.HTTP_200_OK)
+            # The tokens issued before carry the previous identity, so give the new ones.
+            refresh = IdentityRefreshToken.for_user(user)
+            return Response({'refresh': str(refresh), 'access': str(refresh.access_token)},
+                            status=status.HTTP_200_OK)
 
         return JsonResponse(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+class IdentityTokenObtainPairView(TokenObtainPairView):
+    """Issues the token pair carrying the identity of the user. """
+
+    serializer_class = IdentityTokenObtainPairSerializer
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = 'token-obtain-pair'
+
+
+class IdentityTokenRefreshView(TokenRefreshView):
+    """Issues the access token carrying the identity of the user. """
+
+    serializer_class = IdentityTokenRefreshSerializer
+
+
+class PasswordResetRequestView(ResetPasswordRequestToken):
+    """Sends the password reset token to the user. """
+
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = 'password-reset-request'
+
+
+class PasswordResetValidateTokenView(ResetPasswordValidateToken):
+    """Checks whether the password reset token is valid. """
+
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = 'password-reset-validate'
+
+
+class PasswordResetConfirmView(ResetPasswordConfirm):
+    """Resets the password using the password reset token. """
+
+    throttle_classes = AUTH_THROTTLE_CLASSES
+    throttle_scope = 'password-reset-confirm'
+
+
+class TokenRevokeView(TokenViewBase):
+    """Revokes the refresh token (signs the user out). """
+
+    serializer_class = TokenRevokeSerializer
+
+
+class JWKSView(View):
+    """Returns the public keys the tokens can be verified with (JWK Set, see RFC 7517), so that
+    the other services can verify the tokens on their own. The set is empty if the tokens are
+    signed with SECRET_KEY.
+    """
+
+    def get(self, _request, *_args, **_kwargs):  # pylint: disable=no-self-use
+        """GET-method for receiving the public keys. """
+
+        response = JsonResponse({'keys': getattr(state.token_backend, 'jwks', [])})
+        response['Cache-Control'] = 'public, max-age=300'
+
+        return response
+
+
 class UserProfileDelete(generics.CreateAPIView):
     """Delete the current user profile. """
 
@@ -183,13 +295,15 @@ class UserProfileDelete(generics.CreateAPIView):
         username = request.data.get('username', '')
         password = request.data.get('password', '')
 
+        user = get_current_user(request)
         serializer = UserProfileDeleteSerializer(
             data={'username': username, 'password': password},
-            current_user=request.user,
+            current_user=user,
         )
 
         if serializer.is_valid():
-            request.user.delete()
+            # The tokens of the user are revoked by the post_delete receiver.
+            user.delete()
 
             return Response(status=status.HTTP_200_OK)
 
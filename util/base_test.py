@@ -1,8 +1,13 @@
 """Module containing common code that might be shared between different test modules. """
 
+import json
+
 from django.contrib.auth.models import User
+from django.urls import reverse
 from rest_framework.test import APITestCase
 
+from users.throttling import bucket_store
+
 
 class BaseSingleUserTest(APITestCase):
     """Base class for the tests that need to have a user created before running. """
@@ -16,7 +21,19 @@ class BaseSingleUserTest(APITestCase):
         }
 
     def setUp(self):
+        # The limits of the authentication endpoints are per process, so start from scratch.
+        bucket_store.clear()
+
         user = User.objects.create_user(**self._user)
 
         user.person.email_confirmed = True
         user.person.save(update_fields=['email_confirmed'])
+
+    def _get_auth_header(self):
+        """Signs the user in and returns the value of the Authorization header. """
+
+        url = reverse('token-obtain-pair', kwargs={'version': 'v1'})
+        auth = self.client.post(url, data=json.dumps(self._user),
+                                content_type='application/json')
+
+        return b'Bearer ' + json.loads(auth.content)['access'].encode()